@@ -1,4 +1,5 @@
 import os
+import queue
 import sys
 import threading
 import time
@@ -6,6 +7,8 @@ import time
 import pygame
 
 from src.app.button import Button
+from src.graph.instrumentation import Instruments
+from src.mapper.path_gen import ANYTIME_ALGORITHMS
 from src.mapper.simulator import Simulator
 
 BG_COLOR = '#DCDDD8'  # c8d8e3
@@ -30,23 +33,42 @@ class Game:
         self.map_index = 0
 
         # Every algorithm implemented, and which algorithm is currently selected.
-        self.algorithms = ["Greedy", "BFS", "DFS", "A*"]
+        self.algorithms = ["Greedy", "BFS", "DFS", "IDDFS", "A*", "ARA*", "UCS", "Dial", "Bi-BFS", "Bi-Dijkstra"]
         self.algorithm_index = 0
 
+        # Seconds an anytime algorithm gets to find the paths of every car, it then settles for the best ones found.
+        self.search_budget = 0.5
+
+        # (cost, bound) of every path an anytime search finds, handed from the computing thread to the UI.
+        self.solutions = queue.Queue()
+
         # Possible car numbers, and how many cars are selected.
-        self.cars = [1, 2, 3, 4]
+        self.cars = [1, 2, 3, 4, 6, 8, 12, 16]
         self.car_index = 0
+
+        # Collisions between more cars than this are solved by the cooperative planner.
+        self.max_replanned_cars = 4
+
+        # Colors of the cars, reused in the same order when there's more cars than colors.
         self.car_colors = [
             (255, 0, 0, 100),
             (0, 0, 255, 100),
             (245, 66, 236, 100),
-            (255, 255, 255, 150)
+            (255, 255, 255, 150),
+            (0, 200, 0, 100),
+            (255, 220, 0, 100),
+            (0, 220, 220, 100),
+            (255, 140, 0, 100)
         ]
         self.car_color_names = [
             "Red",
             "Blue",
             "Pink",
-            "White"
+            "White",
+            "Green",
+            "Yellow",
+            "Cyan",
+            "Orange"
         ]
 
         # Represents the state of the application, if it's running the simulation or not.
@@ -97,6 +119,10 @@ class Game:
 
         self.simulating = True
 
+    def report_solution(self, path: list, cost: int, bound: float):
+
+        self.solutions.put((cost, bound))
+
     def compute_resolution(self, threading_event: threading.Event, output: list):
 
         map_path = self.map_path + self.maps[self.map_index].lower().replace(" ", "_") + ".txt"
@@ -104,16 +130,31 @@ class Game:
         algorithm = self.algorithms[self.algorithm_index]
         cars = self.cars[self.car_index]
 
-        start_time = time.time()
-        paths, tile_map = Simulator(map_path, algorithm, cars).get_resources()
-        stop_time = time.time()
+        instruments = Instruments()
 
-        print(f"Generated graph and path in {stop_time - start_time} seconds.")
+        search_options, time_budget = None, None
+        if algorithm in ANYTIME_ALGORITHMS:
+            search_options, time_budget = {"on_solution": self.report_solution}, self.search_budget
 
-        output.append(paths)
-        output.append(tile_map)
+        try:
+            start_time = time.time()
+            paths, tile_map = Simulator(map_path, algorithm, cars, cooperative=cars > self.max_replanned_cars,
+                                        instruments=instruments, search_options=search_options,
+                                        time_budget=time_budget).get_resources()
+            stop_time = time.time()
 
-        threading_event.set()
+            print(f"Generated graph and path in {stop_time - start_time} seconds.")
+            print(f"Where the time went: {instruments}")
+
+            output.append(paths)
+            output.append(tile_map)
+
+        except Exception as error:
+            # Handed to the UI to show, instead of leaving it waiting for paths that never come.
+            output.append(error)
+
+        finally:
+            threading_event.set()
 
     def run(self):
 
@@ -156,6 +197,12 @@ class Game:
         running = False
         processing = False
 
+        # Best path found so far by an anytime search, while the paths are computed.
+        progress = None
+
+        # Error computing the paths raised, shown until going back to the menu.
+        failure = None
+
         while True:
 
             # Handling events!
@@ -177,11 +224,11 @@ class Game:
                             start.enable()
                             running = False
 
-                        if event.key == pygame.K_r:
+                        if event.key == pygame.K_r and failure is None:
                             self.screen.blit(tile_map.map_surface, (0, 0))
                             path_counter = 0
 
-                        if event.key == pygame.K_RIGHT:
+                        if event.key == pygame.K_RIGHT and failure is None:
 
                             for i in range(len(paths)):
                                 path = paths[i]
@@ -189,7 +236,7 @@ class Game:
                                 if path_counter + 1 <= len(path[0]):
 
                                     pygame.draw.circle(self.screen,
-                                                       self.car_colors[i],
+                                                       self.car_colors[i % len(self.car_colors)],
                                                        (path[0][path_counter][0] * 64 - 32,
                                                         path[0][path_counter][1] * 64 - 32),
                                                        5)
@@ -199,18 +246,23 @@ class Game:
                                         curr_x, curr_y = path[0][path_counter]
 
                                         pygame.draw.line(self.screen,
-                                                         self.car_colors[i],
+                                                         self.car_colors[i % len(self.car_colors)],
                                                          (prev_x * 64 - 32, prev_y * 64 - 32),
                                                          (curr_x * 64 - 32, curr_y * 64 - 32),
                                                          3)
 
                             path_counter += 1
 
-            if self.simulating and running and not processing:
-                for i in range(self.car_index + 1):
+            if self.simulating and running and not processing and failure is None:
+                for i in range(len(paths)):
                     w = tile_map.map_w - 50
                     h = 20 * (1+i)
-                    self.add_text(f"{self.car_color_names[i]}: {paths[i][1]}", (w, h), "#FFFFFF")
+
+                    name = self.car_color_names[i % len(self.car_color_names)]
+                    if i >= len(self.car_color_names):
+                        name += f" {i // len(self.car_color_names) + 1}"
+
+                    self.add_text(f"{name}: {paths[i][1]}", (w, h), "#FFFFFF")
 
             # Main Menu Display, if the simulation is not running!
             if not running:
@@ -296,6 +348,25 @@ class Game:
                 # Drawing start button!
                 start.draw()
 
+            # While the paths are computed, show the last path an anytime search found.
+            if self.simulating and running and processing:
+                while not self.solutions.empty():
+                    progress = self.solutions.get()
+
+                self.screen.fill(BG_COLOR)
+                self.add_text("Computing...", (self.width / 2, self.height / 2 - 30))
+
+                if progress is not None:
+                    cost, bound = progress
+                    self.add_text(f"Best path cost: {cost}", (self.width / 2, self.height / 2 + 10))
+                    self.add_text(f"At most {bound:.2f}x the optimal", (self.width / 2, self.height / 2 + 40))
+
+            if self.simulating and running and failure is not None:
+                self.screen.fill(BG_COLOR)
+                self.add_text("Couldn't find the paths:", (self.width / 2, self.height / 2 - 30))
+                self.add_text(str(failure), (self.width / 2, self.height / 2 + 10))
+                self.add_text("Press Q to go back", (self.width / 2, self.height / 2 + 50))
+
             # If the start button is clicked, then we set the state to simulating,
             # and compute de result for the selected items. We also set the running state to True.
 
@@ -308,6 +379,10 @@ class Game:
                         results = []
                         finish_event = threading.Event()
 
+                        self.solutions = queue.Queue()
+                        progress = None
+                        failure = None
+
                         thread = threading.Thread(target=self.compute_resolution, args=(finish_event, results))
                         thread.start()
 
@@ -320,9 +395,12 @@ class Game:
                     if finish_event.is_set():
                         processing = False
 
-                        paths, tile_map = results[0], results[1]
-                        self.screen = pygame.display.set_mode((tile_map.map_w, tile_map.map_h))
-                        self.screen.blit(tile_map.map_surface, (0, 0))
+                        if len(results) == 1:
+                            failure = results[0]
+                        else:
+                            paths, tile_map = results[0], results[1]
+                            self.screen = pygame.display.set_mode((tile_map.map_w, tile_map.map_h))
+                            self.screen.blit(tile_map.map_surface, (0, 0))
 
                         finish_event.clear()
 
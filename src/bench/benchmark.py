@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from operator import attrgetter
+from typing import Any, Callable
+
+from src.graph.compact_graph import CompactGraph
+from src.graph.graph import Graph
+from src.graph.instrumentation import Instruments
+from src.graph.lazy_graph import LazyGraph
+from src.models.physics import PhysicsProfile
+from src.mapper.path_gen import generate_paths_graph, lazy_paths_graph, set_heuristics, finish_distances, \
+    nodes_at, resolve_collisions, CircuitNode, ALGORITHMS, BACKENDS, GENERATOR_VERSION, \
+    algorithms_for_backend
+from src.parser.generator import generate_circuit
+from src.parser.parser import parse_map
+
+
+def timed(func: Callable, *args, **kwargs) -> tuple[Any, float]:
+    """
+    Runs a function and measures its wall clock time.
+
+    :return: The result of the function and the elapsed seconds.
+    """
+
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def traced_peak(func: Callable, *args, **kwargs) -> int:
+    """
+    Runs a function under tracemalloc.
+
+    :return: Peak amount of bytes allocated while it ran.
+    """
+
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def synthetic_map(size: str, folder: str, track_width: int, seed: int) -> str:
+    """
+    Writes a random circuit for scale testing.
+
+    :param size: Circuit size, as WIDTHxHEIGHT.
+    :return: Path to the new map file.
+    """
+
+    width, height = (int(side) for side in size.lower().split('x'))
+
+    path = os.path.join(folder, f"synthetic_{width}x{height}.txt")
+    generate_circuit(path, width, height, track_width, seed=seed)
+
+    return path
+
+
+def build(circuit, start_pos_list, finish_pos_list, backend: str, workers: int = 1, vectorized: bool = False,
+          physics: PhysicsProfile | None = None, instruments: Instruments | None = None) \
+        -> Graph | CompactGraph | LazyGraph:
+    match backend:
+        case "dict":
+            graph, _ = generate_paths_graph(circuit, start_pos_list, finish_pos_list, with_heuristics=False,
+                                            workers=workers, vectorized=vectorized, physics=physics,
+                                            instruments=instruments)
+        case "compact":
+            graph, _ = generate_paths_graph(circuit, start_pos_list, finish_pos_list,
+                                            CompactGraph(True, attrgetter('state'), CircuitNode.from_state),
+                                            with_heuristics=False, workers=workers, vectorized=vectorized,
+                                            physics=physics, instruments=instruments)
+        case "lazy":
+            graph = lazy_paths_graph(circuit, start_pos_list, finish_pos_list, physics=physics)
+        case _:
+            raise ValueError(f"unknown backend: {backend}")
+
+    return graph
+
+
+def graph_size(graph: Graph | CompactGraph | LazyGraph) -> tuple[int | None, int | None]:
+    if isinstance(graph, LazyGraph):
+        return None, None
+
+    if isinstance(graph, CompactGraph):
+        return len(graph), graph.edge_count()
+
+    return len(graph.graph), sum(len(edges) for edges in graph.graph.values())
+
+
+def bench_map(map_path: str, backend: str, algorithms: list[str], cars: int, memory: bool, workers: int = 1,
+              vectorized: bool = False, physics: PhysicsProfile | None = None) -> dict:
+    """
+    Benchmarks every phase of solving one map.
+
+    :param map_path: Path to the map.
+    :param backend: Graph backend, one of BACKENDS.
+    :param algorithms: Names of the algorithms to run, keys of ALGORITHMS.
+    :param cars: How many cars to resolve collisions for, 0 to skip it.
+    :param memory: Whether to also measure the peak memory of each phase, which runs it once more.
+    :param workers: Worker processes generating the graph.
+    :param vectorized: Whether to expand the moves in NumPy batches.
+    :param physics: Speed limits of the cars.
+    """
+
+    (circuit, start_pos_list, finish_pos_list), parse_time = timed(parse_map, map_path)
+
+    generation = Instruments()
+    graph, generate_time = timed(build, circuit, start_pos_list, finish_pos_list, backend, workers, vectorized,
+                                 physics, generation)
+
+    heuristics_time = 0.0
+    if backend != "lazy":
+        _, heuristics_time = timed(lambda: set_heuristics(graph, finish_distances(circuit, finish_pos_list)))
+
+    nodes, edges = graph_size(graph)
+
+    result = {
+        "map": os.path.basename(map_path),
+        "width": len(circuit[0]),
+        "height": len(circuit),
+        "backend": backend,
+        "workers": workers,
+        "vectorized": vectorized,
+        "physics": str(physics or PhysicsProfile()),
+        "nodes": nodes,
+        "edges": edges,
+        "time": {
+            "parse_map": parse_time,
+            "generate_paths_graph": generate_time,
+            "set_heuristics": heuristics_time
+        },
+        "generation": generation.report(),
+        "searches": {}
+    }
+
+    if memory:
+        result["peak_memory"] = {
+            "parse_map": traced_peak(parse_map, map_path),
+            "generate_paths_graph": traced_peak(build, circuit, start_pos_list, finish_pos_list, backend, workers,
+                                                vectorized, physics)
+        }
+
+    start_nodes = nodes_at(circuit, start_pos_list)
+    finish_nodes = nodes_at(circuit, finish_pos_list)
+
+    for algorithm in algorithms:
+        search = getattr(graph, ALGORITHMS[algorithm])
+
+        instruments = Instruments()
+        found, search_time = timed(search, start_nodes[0], finish_nodes, instruments=instruments)
+
+        entry = {
+            "time": search_time,
+            "expanded": instruments.counters['expanded'],
+            "peak_frontier": instruments.peaks.get('frontier', 0),
+            "cost": found[1] if found else None,
+            "length": len(found[0]) if found else None
+        }
+
+        if memory:
+            entry["peak_memory"] = traced_peak(search, start_nodes[0], finish_nodes)
+
+        if cars > 0 and found:
+            paths = [search(start_nodes[i % len(start_nodes)], finish_nodes) for i in range(cars)]
+
+            collisions = Instruments()
+            resolved, collisions_time = timed(resolve_collisions, paths, graph, finish_nodes, algorithm, collisions)
+
+            entry["resolve_collisions"] = {
+                "time": collisions_time,
+                "expanded": collisions.counters['expanded'],
+                "costs": [cost for (_, cost) in resolved]
+            }
+
+        result["searches"][algorithm] = entry
+
+    return result
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmarks graph generation and every search algorithm.")
+    parser.add_argument("--maps", default="docs/maps", help="folder with the maps to benchmark")
+    parser.add_argument("--synthetic", nargs="*", default=[],
+                        help="also benchmark random circuits of these sizes, e.g. --synthetic 50x50 200x100")
+    parser.add_argument("--track-width", type=int, default=5, help="track width of the random circuits")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random circuits")
+    parser.add_argument("--backend", choices=BACKENDS, default="dict", help="graph backend")
+    parser.add_argument("--algorithms", nargs="*", choices=list(ALGORITHMS), default=list(ALGORITHMS),
+                        help="algorithms to run")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes expanding the moves of the graphs")
+    parser.add_argument("--vectorized", action="store_true", help="expand the moves in NumPy batches")
+    parser.add_argument("--max-axis-speed", type=int, help="largest speed allowed on each axis")
+    parser.add_argument("--max-speed", type=float, help="largest length allowed of the velocity vector")
+    parser.add_argument("--cars", type=int, default=4, help="cars to resolve collisions for, 0 to skip")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory measurements")
+    parser.add_argument("--output", help="file to write the JSON results to, stdout by default")
+    args = parser.parse_args()
+
+    map_paths = sorted(
+        os.path.join(args.maps, file) for file in os.listdir(args.maps) if file.startswith('map')
+    )
+
+    physics = PhysicsProfile(args.max_axis_speed, args.max_speed)
+
+    algorithms = algorithms_for_backend(args.algorithms, args.backend)
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        map_paths += [synthetic_map(size, folder, args.track_width, args.seed) for size in args.synthetic]
+
+        for map_path in map_paths:
+            print(f"Benchmarking {os.path.basename(map_path)}...", file=sys.stderr)
+            results.append(bench_map(map_path, args.backend, algorithms, args.cars, not args.no_memory,
+                                     args.workers, args.vectorized, physics))
+
+    report = {
+        "python": platform.python_version(),
+        "generator_version": GENERATOR_VERSION,
+        "maps": results
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    SystemExit(main())
@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from src.bench.benchmark import synthetic_map
+from src.mapper.path_gen import generate_paths_graph, CircuitNode
+from src.parser.parser import parse_map
+
+
+class SummedHashKey:
+    """
+    Wraps a node with the hash nodes used to have, the sum of the car coordinates plus the
+    piece and generation hashes, to compare it against the current one.
+    """
+
+    __slots__ = ('node', 'hash')
+
+    def __init__(self, node: CircuitNode) -> None:
+        car = node.car
+        self.node = node
+        self.hash = hash(car.pos.x + car.pos.y + car.vel.x + car.vel.y) + hash(node.piece) + hash(node.gen)
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: 'SummedHashKey') -> bool:
+        return self.node == other.node
+
+
+def largest_map(folder: str) -> str:
+    paths = [os.path.join(folder, file) for file in os.listdir(folder) if file.startswith('map')]
+    return max(paths, key=os.path.getsize)
+
+
+def hash_stats(keys: list, rounds: int) -> dict:
+    """
+    Measures how well a list of distinct keys spreads over their hashes.
+
+    :param keys: Keys to measure.
+    :param rounds: Times every key is looked up.
+    :return: Collision counts and dict lookup throughput.
+    """
+
+    hashes = Counter(hash(key) for key in keys)
+    table = dict.fromkeys(keys)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for key in keys:
+            table[key]
+    elapsed = time.perf_counter() - start
+
+    return {
+        "distinct_hashes": len(hashes),
+        "colliding_keys": len(keys) - len(hashes),
+        "largest_collision": max(hashes.values()),
+        "lookups_per_second": len(keys) * rounds / elapsed
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Compares the old and current CircuitNode hashes.")
+    parser.add_argument("--map", help="map to generate the nodes from, the largest shipped one by default")
+    parser.add_argument("--synthetic", help="generate the nodes from a random circuit of this size instead")
+    parser.add_argument("--rounds", type=int, default=3, help="times every node is looked up")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        if args.synthetic:
+            map_path = synthetic_map(args.synthetic, folder, 5, 0)
+        else:
+            map_path = args.map or largest_map("docs/maps")
+
+        circuit, start_pos_list, finish_pos_list = parse_map(map_path)
+
+    graph, _ = generate_paths_graph(circuit, start_pos_list, finish_pos_list, with_heuristics=False)
+    nodes = list(graph.graph)
+
+    print(f"Hashing {len(nodes)} nodes of {os.path.basename(map_path)}...", file=sys.stderr)
+
+    report = {
+        "map": os.path.basename(map_path),
+        "nodes": len(nodes),
+        "before": hash_stats([SummedHashKey(node) for node in nodes], args.rounds),
+        "after": hash_stats(nodes, args.rounds)
+    }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    SystemExit(main())
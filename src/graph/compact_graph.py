@@ -0,0 +1,531 @@
+import struct
+from array import array
+from math import isnan, nan
+from typing import Any, BinaryIO, Callable, Optional
+
+from src.graph.graph import Graph
+from src.graph.instrumentation import Instruments
+
+# Bit layout of a packed state (x, y, vx, vy, piece, gen), most significant field first.
+# 16 + 16 + 10 + 10 + 2 + 9 = 63 bits, so every key fits a signed 64-bit array slot.
+POS_BITS = 16
+VEL_BITS = 10
+PIECE_BITS = 2
+GEN_BITS = 9
+
+VEL_OFFSET = 1 << (VEL_BITS - 1)
+
+POS_MASK = (1 << POS_BITS) - 1
+VEL_MASK = (1 << VEL_BITS) - 1
+PIECE_MASK = (1 << PIECE_BITS) - 1
+GEN_MASK = (1 << GEN_BITS) - 1
+
+# Header of the binary format: magic, format version, directed flag, node count and edge count.
+FILE_MAGIC = b'RCSR'
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct('<4sBBqq')
+
+
+def pack_state(state: tuple[int, int, int, int, int, int]) -> int:
+    """
+    Packs a (x, y, vx, vy, piece, gen) state into a single integer.
+
+    :param state: Tuple with the position, velocity, piece value and generation of a state.
+    :return: The packed key.
+    """
+
+    x, y, vx, vy, piece, gen = state
+    vx += VEL_OFFSET
+    vy += VEL_OFFSET
+
+    if not (0 <= x <= POS_MASK and 0 <= y <= POS_MASK and 0 <= vx <= VEL_MASK and 0 <= vy <= VEL_MASK
+            and 0 <= piece <= PIECE_MASK and 0 <= gen <= GEN_MASK):
+        raise ValueError(f"state {state} does not fit the packed state layout")
+
+    key = (x << POS_BITS) | y
+    key = (key << VEL_BITS) | vx
+    key = (key << VEL_BITS) | vy
+    key = (key << PIECE_BITS) | piece
+    return (key << GEN_BITS) | gen
+
+
+def unpack_state(key: int) -> tuple[int, int, int, int, int, int]:
+    """
+    Inverse of pack_state.
+
+    :param key: A packed key.
+    :return: The (x, y, vx, vy, piece, gen) state.
+    """
+
+    gen = key & GEN_MASK
+    key >>= GEN_BITS
+    piece = key & PIECE_MASK
+    key >>= PIECE_BITS
+    vy = (key & VEL_MASK) - VEL_OFFSET
+    key >>= VEL_BITS
+    vx = (key & VEL_MASK) - VEL_OFFSET
+    key >>= VEL_BITS
+    y = key & POS_MASK
+    x = key >> POS_BITS
+
+    return x, y, vx, vy, piece, gen
+
+
+def build_csr(size: int, src: array, dst: array, weights: array) -> tuple[array, array, array]:
+    """
+    Builds compressed sparse row arrays out of an edge list. Edges keep their insertion order
+    inside each row and a repeated (src, dst) edge keeps its first position but its last weight,
+    just like overwriting an entry of a dict of dicts.
+
+    :param size: Number of nodes.
+    :param src: Source id of every edge.
+    :param dst: Destination id of every edge.
+    :param weights: Weight of every edge.
+    :return: Tuple with the offsets, targets and weights arrays.
+    """
+
+    counts = [0] * (size + 1)
+    for s in src:
+        counts[s + 1] += 1
+
+    for i in range(size):
+        counts[i + 1] += counts[i]
+
+    offsets = array('q', counts)
+    targets = array('i', bytes(4 * len(src)))
+    csr_weights = array('H', bytes(2 * len(src)))
+
+    cursor = counts[:-1]
+    for s, d, w in zip(src, dst, weights):
+        p = cursor[s]
+        targets[p] = d
+        csr_weights[p] = w
+        cursor[s] = p + 1
+
+    # Duplicated edges are rare (e.g. two accelerations crashing into the same cell),
+    # rows are only rebuilt when they actually hold one.
+    if len(set(zip(src, dst))) == len(src):
+        return offsets, targets, csr_weights
+
+    new_offsets = array('q', [0])
+    new_targets = array('i')
+    new_weights = array('H')
+
+    for i in range(size):
+        row = {}
+        for p in range(offsets[i], offsets[i + 1]):
+            row[targets[p]] = csr_weights[p]
+
+        new_targets.extend(row.keys())
+        new_weights.extend(row.values())
+        new_offsets.append(len(new_targets))
+
+    return new_offsets, new_targets, new_weights
+
+
+def row_sources(offsets: array) -> array:
+    """
+    Inverse of the row compression, the source id of every edge of a CSR graph.
+    """
+
+    src = array('i')
+    for i in range(len(offsets) - 1):
+        src.extend([i] * (offsets[i + 1] - offsets[i]))
+
+    return src
+
+
+class _IdGraph(Graph):
+    """
+    Read-only view over the integer ids of a CompactGraph, so the searches inherited
+    from Graph run on plain ints and CSR slices.
+    """
+
+    def __init__(self, compact: 'CompactGraph') -> None:
+        super().__init__(compact.is_directed)
+        self.compact = compact
+        self.heur = compact.heur
+
+    def get_neighbours(self, nodo) -> list:
+        compact = self.compact
+        start, end = compact.offsets[nodo], compact.offsets[nodo + 1]
+        return list(zip(compact.targets[start:end], compact.weights[start:end]))
+
+    def get_predecessors(self, nodo) -> list:
+        if not self.is_directed:
+            return self.get_neighbours(nodo)
+
+        offsets, targets, weights = self.compact.reverse_csr()
+        start, end = offsets[nodo], offsets[nodo + 1]
+        return list(zip(targets[start:end], weights[start:end]))
+
+    def get_weight(self, val1, val2) -> int | None:
+        for (adjacent, weight) in self.get_neighbours(val1):
+            if adjacent == val2:
+                return weight
+
+        return None
+
+    def nodes(self):
+        return range(len(self.compact.keys))
+
+    def has_val(self, node) -> bool:
+        return 0 <= node < len(self.compact.keys)
+
+
+class CompactGraph:
+    """
+    Graph backend for big state spaces. Every state (x, y, vx, vy, piece, gen) is packed
+    into one integer and given a dense id, edges are kept in CSR arrays (offsets, targets
+    and weights) and heuristics in a flat array indexed by id.
+
+    Nodes are converted at the boundary only: `to_state` turns whatever is passed in
+    (e.g. a CircuitNode) into a state tuple and `from_state` builds the node objects
+    returned by the searches. Both default to using the state tuples themselves.
+
+    The graph is append-only, edges added after a search are merged into the CSR
+    arrays on the next query.
+    """
+
+    supports_predecessors = True
+
+    def __init__(self, directed=False, to_state: Callable[[Any], tuple] = None,
+                 from_state: Callable[[tuple], Any] = None) -> None:
+        self.is_directed = directed
+
+        self.to_state = to_state if to_state is not None else tuple
+        self.from_state = from_state if from_state is not None else tuple
+
+        # Packed state of every id and the reverse mapping.
+        self.keys = array('q')
+        self.index: dict[int, int] = {}
+
+        self.offsets = array('q', [0])
+        self.targets = array('i')
+        self.weights = array('H')
+
+        # Edges added since the last time the CSR arrays were built.
+        self.pending_src = array('i')
+        self.pending_dst = array('i')
+        self.pending_weights = array('H')
+
+        # Reverse edges in CSR form, only built when some search walks edges backwards.
+        self.reverse = None
+
+        self.heur = array('d')
+
+        self.ids = _IdGraph(self)
+
+    def state_id(self, state: tuple) -> int:
+        """
+        Same as id_of, but for a state tuple, skipping the `to_state` conversion.
+        """
+
+        key = pack_state(state)
+        node_id = self.index.get(key)
+
+        if node_id is None:
+            node_id = len(self.keys)
+            self.index[key] = node_id
+            self.keys.append(key)
+            self.heur.append(nan)
+
+        return node_id
+
+    def key_ids(self, keys: list[int]) -> list[int]:
+        """
+        Same as state_id, for many states already packed.
+        """
+
+        index = self.index
+        ids = []
+
+        for key in keys:
+            node_id = index.get(key)
+
+            if node_id is None:
+                node_id = len(self.keys)
+                index[key] = node_id
+                self.keys.append(key)
+                self.heur.append(nan)
+
+            ids.append(node_id)
+
+        return ids
+
+    def id_of(self, val) -> int:
+        """
+        Returns the id of a node, registering it if it's new. Only meant for building the
+        graph, lookups go through find_id.
+        """
+
+        return self.state_id(self.to_state(val))
+
+    def find_id(self, val) -> Optional[int]:
+        return self.index.get(pack_state(self.to_state(val)))
+
+    def node_of(self, node_id: int):
+        return self.from_state(unpack_state(self.keys[node_id]))
+
+    def add_edge(self, val1, val2, weight) -> None:
+        self.add_id_edge(self.id_of(val1), self.id_of(val2), weight)
+
+    def add_state_edge(self, state1: tuple, state2: tuple, weight) -> None:
+        self.add_id_edge(self.state_id(state1), self.state_id(state2), weight)
+
+    def add_id_edge(self, id1: int, id2: int, weight) -> None:
+        self.pending_src.append(id1)
+        self.pending_dst.append(id2)
+        self.pending_weights.append(weight)
+
+        if not self.is_directed:
+            self.pending_src.append(id2)
+            self.pending_dst.append(id1)
+            self.pending_weights.append(weight)
+
+    def add_id_edges(self, src: list[int], dst: list[int], weights: array) -> None:
+        """
+        Same as add_id_edge, for many edges at once.
+        """
+
+        self.pending_src.extend(src)
+        self.pending_dst.extend(dst)
+        self.pending_weights.extend(weights)
+
+        if not self.is_directed:
+            self.pending_src.extend(dst)
+            self.pending_dst.extend(src)
+            self.pending_weights.extend(weights)
+
+    def add_val(self, val) -> None:
+        self.id_of(val)
+
+    def has_val(self, node) -> bool:
+        return self.find_id(node) is not None
+
+    def freeze(self) -> None:
+        """
+        Merges the pending edges into the CSR arrays.
+        """
+
+        size = len(self.keys)
+        if len(self.pending_src) == 0 and len(self.offsets) == size + 1:
+            return
+
+        src = row_sources(self.offsets)
+        src.extend(self.pending_src)
+        dst = self.targets + self.pending_dst
+        weights = self.weights + self.pending_weights
+
+        self.offsets, self.targets, self.weights = build_csr(size, src, dst, weights)
+        self.reverse = None
+
+        self.pending_src = array('i')
+        self.pending_dst = array('i')
+        self.pending_weights = array('H')
+
+    def reverse_csr(self) -> tuple[array, array, array]:
+        self.freeze()
+
+        if self.reverse is None:
+            self.reverse = build_csr(len(self.keys), self.targets, row_sources(self.offsets), self.weights)
+
+        return self.reverse
+
+    def get_weight(self, val1, val2) -> int | None:
+        self.freeze()
+
+        id1, id2 = self.find_id(val1), self.find_id(val2)
+        if id1 is None or id2 is None:
+            return None
+
+        return self.ids.get_weight(id1, id2)
+
+    def get_neighbours(self, nodo) -> list:
+        self.freeze()
+
+        # Looking a node up never registers it, ids are only handed out while building.
+        node_id = self.find_id(nodo)
+        if node_id is None:
+            return []
+
+        return [(self.node_of(i), w) for (i, w) in self.ids.get_neighbours(node_id)]
+
+    def get_predecessors(self, nodo) -> list:
+        self.freeze()
+
+        node_id = self.find_id(nodo)
+        if node_id is None:
+            return []
+
+        return [(self.node_of(i), w) for (i, w) in self.ids.get_predecessors(node_id)]
+
+    def nodes(self):
+        return (self.node_of(i) for i in range(len(self.keys)))
+
+    def path_cost(self, path):
+        self.freeze()
+        return self.ids.path_cost([self.find_id(node) for node in path])
+
+    def add_heuristic(self, val, heur):
+        self.heur[self.id_of(val)] = heur
+
+    def has_heuristic(self, val):
+        node_id = self.find_id(val)
+        return node_id is not None and not isnan(self.heur[node_id])
+
+    def get_heuristic(self, val):
+        return self.heur[self.find_id(val)]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def edge_count(self) -> int:
+        self.freeze()
+        return len(self.targets)
+
+    def to_graph(self) -> Graph:
+        """
+        Expands the compact graph back into a dict-of-dicts Graph of node objects,
+        for code that needs to mutate it (e.g. collision resolution).
+        """
+
+        self.freeze()
+        nodes = [self.node_of(i) for i in range(len(self.keys))]
+
+        graph = Graph(self.is_directed)
+        for node in nodes:
+            graph.add_val(node)
+
+        for i, node in enumerate(nodes):
+            for (j, weight) in self.ids.get_neighbours(i):
+                graph.add_edge(node, nodes[j], weight)
+
+            if not isnan(self.heur[i]):
+                graph.heur[node] = self.heur[i]
+
+        return graph
+
+    def save(self, file: BinaryIO) -> None:
+        """
+        Writes the graph in a compact binary format, the raw arrays preceded by a small header.
+        Arrays are written in the machine byte order, so files are not meant to be shared
+        between platforms.
+
+        :param file: File opened for binary writing.
+        """
+
+        self.freeze()
+        file.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, self.is_directed, len(self.keys), len(self.targets)))
+
+        for data in (self.keys, self.heur, self.offsets, self.targets, self.weights):
+            data.tofile(file)
+
+    @classmethod
+    def load(cls, file: BinaryIO, to_state: Callable[[Any], tuple] = None,
+             from_state: Callable[[tuple], Any] = None) -> 'CompactGraph':
+        """
+        Reads a graph written by save.
+
+        :param file: File opened for binary reading.
+        :param to_state: Same as in the constructor.
+        :param from_state: Same as in the constructor.
+        """
+
+        magic, version, directed, size, edges = FILE_HEADER.unpack(file.read(FILE_HEADER.size))
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError("not a compact graph file, or written by an incompatible version")
+
+        graph = cls(bool(directed), to_state, from_state)
+
+        graph.keys.fromfile(file, size)
+        graph.heur.fromfile(file, size)
+        graph.offsets = array('q')
+        graph.offsets.fromfile(file, size + 1)
+        graph.targets.fromfile(file, edges)
+        graph.weights.fromfile(file, edges)
+
+        graph.index = {key: node_id for (node_id, key) in enumerate(graph.keys)}
+
+        return graph
+
+    def __str__(self) -> str:
+        return str(self.to_graph())
+
+    def draw(self):
+        self.to_graph().draw()
+
+    # Search Functions #
+
+    def run_search(self, search: Callable, start, end_list, **kwargs) -> Optional[tuple[list, int]]:
+        """
+        Runs one of the id level searches, translating the nodes on the way in and out.
+
+        :param search: Unbound search method of Graph.
+        :param start: Start node.
+        :param end_list: Goal nodes, the ones missing from the graph are ignored.
+        :param kwargs: Extra options of the search.
+        """
+
+        self.freeze()
+
+        start_id = self.index[pack_state(self.to_state(start))]
+        end_ids = {node_id for node_id in map(self.find_id, end_list) if node_id is not None}
+
+        # Searches expand ids, the expansion callback is handed the nodes.
+        if kwargs.get('instruments') is not None:
+            kwargs['instruments'] = kwargs['instruments'].translated(self.node_of)
+
+        result = search(self.ids, start_id, end_ids, **kwargs)
+        if result is None:
+            return None
+
+        path, cost = result
+        return [self.node_of(i) for i in path], cost
+
+    def dfs_search(self, start_node, end_node_list, max_depth=None,
+                   instruments: Optional[Instruments] = None) -> Optional[tuple[list, int]]:
+        return self.run_search(Graph.dfs_search, start_node, end_node_list, max_depth=max_depth,
+                               instruments=instruments)
+
+    def iddfs_search(self, start_node, end_node_list, max_depth=None,
+                     instruments: Optional[Instruments] = None) -> Optional[tuple[list, int]]:
+        return self.run_search(Graph.iddfs_search, start_node, end_node_list, max_depth=max_depth,
+                               instruments=instruments)
+
+    def bfs_search(self, start_node, end_node_list, instruments: Optional[Instruments] = None) \
+            -> Optional[tuple[list, int]]:
+        return self.run_search(Graph.bfs_search, start_node, end_node_list, instruments=instruments)
+
+    def greedy_search(self, start, end_list, instruments: Optional[Instruments] = None) -> tuple[list, int] | None:
+        return self.run_search(Graph.greedy_search, start, end_list, instruments=instruments)
+
+    def a_star_search(self, start, end_list, instruments: Optional[Instruments] = None) -> tuple[list, int] | None:
+        return self.run_search(Graph.a_star_search, start, end_list, instruments=instruments)
+
+    def anytime_a_star_search(self, start, end_list, weight: float = 10.0, weight_step: float = 2.0,
+                              deadline: Optional[float] = None, max_expansions: Optional[int] = None,
+                              on_solution: Optional[Callable[[list, int, float], None]] = None,
+                              instruments: Optional[Instruments] = None) -> tuple[list, int] | None:
+        if on_solution is not None:
+            report = on_solution
+            on_solution = lambda path, cost, bound: report([self.node_of(i) for i in path], cost, bound)
+
+        return self.run_search(Graph.anytime_a_star_search, start, end_list, weight=weight, weight_step=weight_step,
+                               deadline=deadline, max_expansions=max_expansions, on_solution=on_solution,
+                               instruments=instruments)
+
+    def uniform_cost_search(self, start, end_list, instruments: Optional[Instruments] = None) \
+            -> tuple[list, int] | None:
+        return self.run_search(Graph.uniform_cost_search, start, end_list, instruments=instruments)
+
+    def dial_search(self, start, end_list, instruments: Optional[Instruments] = None) -> tuple[list, int] | None:
+        return self.run_search(Graph.dial_search, start, end_list, instruments=instruments)
+
+    def bidirectional_bfs_search(self, start_node, end_node_list, instruments: Optional[Instruments] = None) \
+            -> Optional[tuple[list, int]]:
+        return self.run_search(Graph.bidirectional_bfs_search, start_node, end_node_list, instruments=instruments)
+
+    def bidirectional_dijkstra_search(self, start, end_list, instruments: Optional[Instruments] = None) \
+            -> tuple[list, int] | None:
+        return self.run_search(Graph.bidirectional_dijkstra_search, start, end_list, instruments=instruments)
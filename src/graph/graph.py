@@ -1,11 +1,21 @@
-import matplotlib.pyplot as plt
-import networkx as nx
-
-from typing import Optional, Any
+import time
+from collections import deque
+from heapq import heapify, heappop, heappush
+from itertools import count
+from typing import Callable, Optional, Any
 from queue import Queue
 
+from src.graph.instrumentation import Instruments, instrumented
+
+# Weight anytime searches switch to when they run out of budget before their first path, so
+# large the heuristic alone decides, and the search turns greedy.
+GREEDY_WEIGHT = 1_000_000.0
+
 
 class Graph:
+    # Whether get_predecessors can list the edges into a node, which bidirectional searches need.
+    supports_predecessors = True
+
     def __init__(self, directed=False) -> None:
         self.graph = {}
         self.reverse_graph = {}
@@ -28,6 +38,46 @@ class Graph:
                 self.reverse_graph[val2] = {}
             self.reverse_graph[val2][val1] = weight
 
+    def add_edge_rows(self, vals: list, rows: tuple, reverse_rows: tuple) -> None:
+        """
+        Same as add_edge for every edge of some rows, but a row at a time. Row i holds the edges
+        from vals[nodes[i]] to vals[targets[j]], weighing weights[j], for j in offsets[i] up to
+        offsets[i + 1], and reverse_rows holds the same edges grouped by their destination.
+
+        :param vals: Every node the edges go through, in the order add_edge would first see them.
+        :param rows: (nodes, offsets, targets, weights) of the edges, grouped by source.
+        :param reverse_rows: Same, grouped by destination, with the sources as targets.
+        """
+
+        nodes, offsets, targets, weights = rows
+
+        if not self.is_directed:
+            for (i, node) in enumerate(nodes):
+                for j in range(offsets[i], offsets[i + 1]):
+                    self.add_edge(vals[node], vals[targets[j]], weights[j])
+            return
+
+        graph = self.graph
+        for val in vals:
+            if val not in graph:
+                graph[val] = {}
+
+        val_of = vals.__getitem__
+
+        for (i, node) in enumerate(nodes):
+            start, end = offsets[i], offsets[i + 1]
+            graph[vals[node]].update(zip(map(val_of, targets[start:end]), weights[start:end]))
+
+        nodes, offsets, targets, weights = reverse_rows
+        reverse_graph = self.reverse_graph
+
+        for (i, node) in enumerate(nodes):
+            start, end = offsets[i], offsets[i + 1]
+            edges = reverse_graph.get(vals[node])
+            if edges is None:
+                edges = reverse_graph[vals[node]] = {}
+            edges.update(zip(map(val_of, targets[start:end]), weights[start:end]))
+
     def remove_edge(self, val1, val2) -> None:
         del self.graph[val1][val2]
         if not self.is_directed:
@@ -63,15 +113,27 @@ class Graph:
         cost = 0
         assert len(path) >= 2
         for i in range(1, len(path)):
-            cost += self.graph[path[i - 1]][path[i]]
+            cost += self.get_weight(path[i - 1], path[i])
 
         return cost
 
     def get_neighbours(self, nodo) -> list:
-        lista = []
-        for (adjacente, peso) in self.graph[nodo].items():
-            lista.append((adjacente, peso))
-        return lista
+        return list(self.graph[nodo].items())
+
+    def nodes(self):
+        return self.graph.keys()
+
+    def to_graph(self) -> 'Graph':
+        """
+        Returns the graph in its dict-of-dicts form, other backends expand themselves into one.
+        """
+        return self
+
+    def get_predecessors(self, nodo) -> list:
+        if not self.is_directed:
+            return self.get_neighbours(nodo)
+
+        return list(self.reverse_graph.get(nodo, {}).items())
 
     def get_all_associated(self, val) -> tuple[list[Any], list[Any]]:
         lista_ir = []
@@ -95,33 +157,104 @@ class Graph:
 
     # Search Functions #
 
-    def dfs_search(self, start_node, end_node_list, path=None, visited=None) -> Optional[tuple[list, int]]:
+    def depth_limited_search(self, start_node, end_node_list, max_depth=None,
+                             instruments: Optional[Instruments] = None) -> tuple[Optional[tuple[list, int]], bool]:
+        """
+        Depth first search with an explicit stack, so deep graphs never hit the recursion limit.
+        The cost of the current path is kept along with it instead of being recomputed.
 
-        if visited is None:
-            visited = set()
+        :param max_depth: Maximum amount of edges in a path, None for no limit.
+        :param instruments: Where to report every node expanded.
+        :return: The (path, cost) found, or None, and whether some node was left unexplored
+                 because of the depth limit.
+        """
 
-        if path is None:
-            path = list()
+        if start_node in end_node_list:
+            return ([start_node], 0), False
 
-        path.append(start_node)
-        visited.add(start_node)
+        # Depth at which every node was first reached. Without a depth limit a node is never
+        # visited twice, with one it's visited again if reached through a shorter path.
+        visited = {start_node: 0}
 
-        if start_node in end_node_list:
-            cost = self.path_cost(path)
-            return path, cost
+        expand = instruments.expand if instruments is not None else None
+
+        path = [start_node]
+        costs = [0]
+        stack = [iter(self.get_neighbours(start_node))]
+        cut_off = False
+
+        if expand is not None:
+            expand(start_node, len(stack))
+
+        while len(stack) > 0:
+            # Depth of the nodes reached from the top of the stack.
+            depth = len(path)
+
+            for (adjacent_node, weight) in stack[-1]:
 
-        for (adjacent_node, weight) in self.graph[start_node].items():
+                if adjacent_node in visited and (max_depth is None or visited[adjacent_node] <= depth):
+                    continue
 
-            if adjacent_node not in visited:
-                result = self.dfs_search(adjacent_node, end_node_list, path, visited)
+                # Past the depth limit, only reached from the start node when the limit is 0.
+                if max_depth is not None and depth > max_depth:
+                    cut_off = True
+                    stack.pop()
+                    path.pop()
+                    costs.pop()
+                    break
 
-                if result:
-                    return result
+                visited[adjacent_node] = depth
+                path.append(adjacent_node)
+                costs.append(costs[-1] + weight)
+
+                if adjacent_node in end_node_list:
+                    return (path, costs[-1]), cut_off
+
+                if max_depth is not None and depth >= max_depth:
+                    cut_off = True
+                    path.pop()
+                    costs.pop()
+                    continue
+
+                stack.append(iter(self.get_neighbours(adjacent_node)))
+
+                if expand is not None:
+                    expand(adjacent_node, len(stack))
+                break
+
+            else:
+                stack.pop()
+                path.pop()
+                costs.pop()
+
+        return None, cut_off
+
+    @instrumented
+    def dfs_search(self, start_node, end_node_list, max_depth=None,
+                   instruments: Optional[Instruments] = None) -> Optional[tuple[list, int]]:
+        result, _ = self.depth_limited_search(start_node, end_node_list, max_depth, instruments)
+        return result
+
+    @instrumented
+    def iddfs_search(self, start_node, end_node_list, max_depth=None,
+                     instruments: Optional[Instruments] = None) -> Optional[tuple[list, int]]:
+        # Depth limited searches with growing limits, the first path found has the least edges.
+        depth = 0
+        while max_depth is None or depth <= max_depth:
+            result, cut_off = self.depth_limited_search(start_node, end_node_list, depth, instruments)
+
+            if result is not None or not cut_off:
+                return result
+
+            depth += 1
 
-        path.pop()
         return None
 
-    def bfs_search(self, start_node, end_node_list) -> Optional[tuple[list, int]]:
+    @instrumented
+    def bfs_search(self, start_node, end_node_list, instruments: Optional[Instruments] = None) \
+            -> Optional[tuple[list, int]]:
+
+        expand = instruments.expand if instruments is not None else None
 
         visited = set()
         queue = Queue()
@@ -143,7 +276,10 @@ class Graph:
                 path_found = True
 
             else:
-                for (adjacent_node, weight) in self.graph[current_node].items():
+                if expand is not None:
+                    expand(current_node, queue.qsize())
+
+                for (adjacent_node, weight) in self.get_neighbours(current_node):
 
                     if adjacent_node not in visited:
                         queue.put(adjacent_node)
@@ -156,7 +292,7 @@ class Graph:
 
             path.append(end_node_found)
 
-            while parent[end_node_found]:
+            while parent[end_node_found] is not None:
                 path.append(parent[end_node_found])
                 end_node_found = parent[end_node_found]
 
@@ -165,92 +301,490 @@ class Graph:
 
         return path, cost
 
-    def greedy_search(self, start, end_list) -> tuple[list, int] | None:
-        open_list = {start}
+    @staticmethod
+    def reconstruct_path(parents, start, n) -> list:
+        reconst_path = []
+
+        while parents[n] != n:
+            reconst_path.append(n)
+            n = parents[n]
+
+        reconst_path.append(start)
+
+        reconst_path.reverse()
+
+        return reconst_path
+
+    @instrumented
+    def greedy_search(self, start, end_list, instruments: Optional[Instruments] = None) -> tuple[list, int] | None:
+        # Open list is a binary heap of (heuristic, insertion order, node), the insertion
+        # order breaks ties in a FIFO fashion and keeps nodes from ever being compared.
+        expand = instruments.expand if instruments is not None else None
+
+        counter = count()
+        open_heap = [(self.get_heuristic(start), next(counter), start)]
         closed_list = set([])
 
         parents = {start: start}
 
-        while len(open_list) > 0:
-            n = None
-
-            for v in open_list:
-                if n is None or self.heur[v] < self.heur[n]:
-                    n = v
+        while len(open_heap) > 0:
+            _, _, n = heappop(open_heap)
 
-            if n is None:
-                print('Path does not exist!')
-                return None
+            if n in closed_list:
+                continue
 
             if n in end_list:
-                reconst_path = []
+                reconst_path = self.reconstruct_path(parents, start, n)
+                return reconst_path, self.path_cost(reconst_path)
+
+            if expand is not None:
+                expand(n, len(open_heap))
+
+            for (m, weight) in self.get_neighbours(n):
+                if m not in parents:
+                    parents[m] = n
+                    heappush(open_heap, (self.get_heuristic(m), next(counter), m))
 
-                while parents[n] != n:
-                    reconst_path.append(n)
-                    n = parents[n]
+            closed_list.add(n)
+
+        return None
+
+    @instrumented
+    def a_star_search(self, start, end_list, instruments: Optional[Instruments] = None) -> tuple[list, int] | None:
+        # Entries are (f, h, insertion order, g, node), ties on f go to the node closest to the goal.
+        # Instead of decrease-key, a node whose g-cost improves is pushed again and the stale
+        # entry is skipped once popped.
+        expand = instruments.expand if instruments is not None else None
+
+        counter = count()
+        h_start = self.get_heuristic(start)
+        open_heap = [(h_start, h_start, next(counter), 0, start)]
+        closed_list = set([])
+
+        parents = {start: start}
+
+        g = {start: 0}
 
-                reconst_path.append(start)
+        while len(open_heap) > 0:
+            _, _, _, g_n, n = heappop(open_heap)
 
-                reconst_path.reverse()
+            if g_n > g[n] or n in closed_list:
+                continue
 
+            if n in end_list:
+                reconst_path = self.reconstruct_path(parents, start, n)
                 return reconst_path, self.path_cost(reconst_path)
 
+            if expand is not None:
+                expand(n, len(open_heap))
+
             for (m, weight) in self.get_neighbours(n):
-                if m not in open_list and m not in closed_list:
-                    open_list.add(m)
+                g_m = g_n + weight
+
+                if m not in g or g_m < g[m]:
+                    # A cheaper way into an already expanded node re-opens it.
+                    closed_list.discard(m)
                     parents[m] = n
+                    g[m] = g_m
+                    h_m = self.get_heuristic(m)
+                    heappush(open_heap, (g_m + h_m, h_m, next(counter), g_m, m))
 
-            open_list.remove(n)
             closed_list.add(n)
 
-        print('Path does not exist!')
         return None
 
-    def a_star_search(self, start, end_list) -> tuple[list, int] | None:
-        open_list = {start}
+    @instrumented
+    def anytime_a_star_search(self, start, end_list, weight: float = 10.0, weight_step: float = 2.0,
+                              deadline: Optional[float] = None, max_expansions: Optional[int] = None,
+                              on_solution: Optional[Callable[[list, int, float], None]] = None,
+                              instruments: Optional[Instruments] = None) -> tuple[list, int] | None:
+        """
+        Anytime Repairing A* (ARA*). A first path is found quickly by an A* with the heuristic
+        inflated by weight, then the weight is lowered by weight_step and the search goes on from
+        where it was, only going over the nodes whose cost improved, until the weight is 1 and the
+        path is optimal, or the budget runs out.
+
+        Running out of budget before the first path turns the search greedy, it then stops at the
+        first path it finds.
+
+        :param weight: Inflation of the heuristic on the first path, at least 1.
+        :param weight_step: How much the weight drops after every path.
+        :param deadline: time.perf_counter() value the search must stop at, so several searches
+                         can share it, unbounded if None.
+        :param max_expansions: Nodes the search may expand, unbounded if None.
+        :param on_solution: Called with every better path found, its cost, and how many times the
+                            optimal cost it may be at most.
+        :param instruments: Where to report every node expanded, every path found, and the largest
+                            bound a search settled for, as the 'bound' peak.
+        :return: The best path found and its cost.
+        """
+
+        if weight < 1 or weight_step <= 0:
+            raise ValueError("the weight must be at least 1 and the weight step positive")
+
+        goals = set(end_list)
+        if start in goals:
+            return [start], 0
+
+        expand = instruments.expand if instruments is not None else None
+        expansions = 0
+
+        # Entries are (g + weight * h, h, insertion order, g, node), with the same lazy deletion
+        # as A*. Goals are never expanded, the best one reached so far is kept aside instead.
+        counter = count()
+        h_start = self.get_heuristic(start)
+        open_heap = [(weight * h_start, h_start, next(counter), 0, start)]
         closed_list = set([])
 
+        # Nodes whose cost improved after being expanded, left for the next, lighter, search.
+        inconsistent = set([])
+
         parents = {start: start}
 
         g = {start: 0}
 
-        while len(open_list) > 0:
-            n = None
+        best_goal, best_g = None, None
+        found = None
+
+        exhausted = False
+
+        # Whether the budget ran out in the middle of a search that followed a path found.
+        interrupted = False
+
+        while True:
+
+            while len(open_heap) > 0 and (best_g is None or best_g > open_heap[0][0]):
+                _, _, _, g_n, n = heappop(open_heap)
+
+                if g_n > g[n] or n in closed_list:
+                    continue
+
+                if (found is not None or not exhausted) and \
+                        ((deadline is not None and time.perf_counter() > deadline) or
+                         (max_expansions is not None and expansions >= max_expansions)):
+                    exhausted = True
 
-            for v in open_list:
-                if n is None or self.heur[v] + g[v] < self.heur[n] + g[n]:
-                    n = v
+                    # Put back, it still counts towards the bound on the optimal cost.
+                    h_n = self.get_heuristic(n)
 
-            if n is None:
-                print('Path does not exist!')
+                    if found is not None:
+                        heappush(open_heap, (g_n + weight * h_n, h_n, next(counter), g_n, n))
+                        interrupted = True
+                        break
+
+                    weight = GREEDY_WEIGHT
+                    open_heap = [(g_k + weight * h_k, h_k, next(counter), g_k, k)
+                                 for (_, h_k, _, g_k, k) in open_heap if g_k == g[k]]
+                    open_heap.append((g_n + weight * h_n, h_n, next(counter), g_n, n))
+                    heapify(open_heap)
+                    continue
+
+                if expand is not None:
+                    expand(n, len(open_heap))
+                expansions += 1
+
+                for (m, edge_weight) in self.get_neighbours(n):
+                    g_m = g_n + edge_weight
+
+                    if m not in g or g_m < g[m]:
+                        parents[m] = n
+                        g[m] = g_m
+
+                        if m in goals:
+                            if best_g is None or g_m < best_g:
+                                best_goal, best_g = m, g_m
+                        elif m not in closed_list:
+                            h_m = self.get_heuristic(m)
+                            heappush(open_heap, (g_m + weight * h_m, h_m, next(counter), g_m, m))
+                        elif weight == 1:
+                            # The last search is a plain A*, which re-opens the node.
+                            closed_list.discard(m)
+                            h_m = self.get_heuristic(m)
+                            heappush(open_heap, (g_m + h_m, h_m, next(counter), g_m, m))
+                        else:
+                            inconsistent.add(m)
+
+                closed_list.add(n)
+
+            if best_goal is None:
                 return None
 
-            if n in end_list:
-                reconst_path = []
+            # Every node left to go over, with its heuristic. Their cost plus heuristic bounds the
+            # optimal cost from below.
+            pending = {n: h_n for (_, h_n, _, g_n, n) in open_heap if g_n == g[n] and n not in closed_list}
+            for n in inconsistent:
+                pending[n] = self.get_heuristic(n)
 
-                while parents[n] != n:
-                    reconst_path.append(n)
-                    n = parents[n]
+            lower = min((g[n] + h_n for (n, h_n) in pending.items()), default=best_g)
 
-                reconst_path.append(start)
+            path = self.reconstruct_path(parents, start, best_goal)
+            cost = self.path_cost(path)
 
-                reconst_path.reverse()
+            improved = found is None or cost < found[1]
+            if improved:
+                found = (path, cost)
 
-                return reconst_path, self.path_cost(reconst_path)
+            path, cost = found
+
+            # An interrupted search proves nothing about its weight, only the one before it does.
+            settled = bound if interrupted else weight
+            bound = 1.0 if cost <= lower else min(settled, cost / lower) if lower > 0 else settled
+
+            if improved:
+                if instruments is not None:
+                    instruments.count('solutions')
+                if on_solution is not None:
+                    on_solution(path, cost, bound)
+
+            if exhausted or weight == 1 or bound == 1:
+                if instruments is not None:
+                    instruments.peak('bound', bound)
+                return found
+
+            # Any weight above the bound already proven would only find the same path again.
+            weight = max(1.0, min(weight - weight_step, bound))
+
+            open_heap = [(g[n] + weight * h_n, h_n, next(counter), g[n], n) for (n, h_n) in pending.items()]
+            heapify(open_heap)
+
+            closed_list = set([])
+            inconsistent = set([])
+
+    @instrumented
+    def uniform_cost_search(self, start, end_list, instruments: Optional[Instruments] = None) \
+            -> tuple[list, int] | None:
+        # Dijkstra, with the same lazy deletion as A*: entries are (g, insertion order, node).
+        expand = instruments.expand if instruments is not None else None
+
+        counter = count()
+        open_heap = [(0, next(counter), start)]
+        closed_list = set([])
+
+        parents = {start: start}
+
+        g = {start: 0}
+
+        while len(open_heap) > 0:
+            g_n, _, n = heappop(open_heap)
+
+            if n in closed_list:
+                continue
+
+            if n in end_list:
+                return self.reconstruct_path(parents, start, n), g_n
+
+            if expand is not None:
+                expand(n, len(open_heap))
 
             for (m, weight) in self.get_neighbours(n):
-                if m not in open_list and m not in closed_list:
-                    open_list.add(m)
+                g_m = g_n + weight
+
+                if m not in g or g_m < g[m]:
                     parents[m] = n
-                    g[m] = g[n] + weight
+                    g[m] = g_m
+                    heappush(open_heap, (g_m, next(counter), m))
 
-            open_list.remove(n)
             closed_list.add(n)
 
-        print('Path does not exist!')
         return None
 
+    @instrumented
+    def dial_search(self, start, end_list, instruments: Optional[Instruments] = None) -> tuple[list, int] | None:
+        # Dijkstra over a bucket queue (Dial's algorithm), bucket i holds the nodes at distance i.
+        # Edge weights must be non-negative integers, 0 weight edges land on the current bucket.
+        expand = instruments.expand if instruments is not None else None
+
+        buckets = [deque([start])]
+        closed_list = set([])
+
+        parents = {start: start}
+
+        g = {start: 0}
+
+        current = 0
+        while current < len(buckets):
+            bucket = buckets[current]
+
+            while len(bucket) > 0:
+                n = bucket.popleft()
+
+                if n in closed_list or g[n] != current:
+                    continue
+
+                if n in end_list:
+                    return self.reconstruct_path(parents, start, n), current
+
+                # Only the current bucket is measured, adding up every other one would cost too much.
+                if expand is not None:
+                    expand(n, len(bucket))
+
+                for (m, weight) in self.get_neighbours(n):
+                    g_m = current + weight
+
+                    if m not in g or g_m < g[m]:
+                        parents[m] = n
+                        g[m] = g_m
+
+                        while len(buckets) <= g_m:
+                            buckets.append(deque())
+                        buckets[g_m].append(m)
+
+                closed_list.add(n)
+
+            # Emptied buckets are dropped so memory only holds the ones still ahead.
+            buckets[current] = None
+            current += 1
+
+        return None
+
+    @staticmethod
+    def bfs_layer(frontier: list, depth: dict, parents: dict, other_depth: dict, neighbours,
+                  instruments: Optional[Instruments] = None) -> tuple[list, Any]:
+        """
+        Expands a whole BFS layer of one side of a bidirectional search.
+
+        :param neighbours: Function listing the (node, weight) pairs a node is expanded into.
+
+        :return: The next layer and the node where both sides met with the least total depth, if any.
+        """
+
+        expand = instruments.expand if instruments is not None else None
+
+        next_frontier = []
+        meet = None
+
+        for n in frontier:
+            if expand is not None:
+                expand(n, len(frontier))
+
+            for (m, weight) in neighbours(n):
+                if m in depth:
+                    continue
+
+                depth[m] = depth[n] + 1
+                parents[m] = n
+                next_frontier.append(m)
+
+                if m in other_depth and (meet is None or other_depth[m] < other_depth[meet]):
+                    meet = m
+
+        return next_frontier, meet
+
+    @staticmethod
+    def join_paths(meet, parents_f: dict, parents_b: dict) -> list:
+        """
+        Builds the full path of a bidirectional search out of both parent chains.
+        """
+
+        path = []
+
+        n = meet
+        while n is not None:
+            path.append(n)
+            n = parents_f[n]
+
+        path.reverse()
+
+        n = parents_b[meet]
+        while n is not None:
+            path.append(n)
+            n = parents_b[n]
+
+        return path
+
+    @instrumented
+    def bidirectional_bfs_search(self, start_node, end_node_list, instruments: Optional[Instruments] = None) \
+            -> Optional[tuple[list, int]]:
+        # One BFS from the start and another one from every goal at once, over the reverse
+        # edges, always growing the smaller frontier by a whole layer.
+        if not self.supports_predecessors:
+            raise TypeError("bidirectional searches need the predecessors of the nodes")
+
+        if start_node in end_node_list:
+            return [start_node], 0
+
+        ends = [n for n in end_node_list if self.has_val(n)]
+
+        depth_f, parents_f, frontier_f = {start_node: 0}, {start_node: None}, [start_node]
+        depth_b, parents_b, frontier_b = {n: 0 for n in ends}, {n: None for n in ends}, ends
+
+        while len(frontier_f) > 0 and len(frontier_b) > 0:
+
+            if len(frontier_f) <= len(frontier_b):
+                frontier_f, meet = self.bfs_layer(frontier_f, depth_f, parents_f, depth_b, self.get_neighbours,
+                                                  instruments)
+            else:
+                frontier_b, meet = self.bfs_layer(frontier_b, depth_b, parents_b, depth_f, self.get_predecessors,
+                                                  instruments)
+
+            if meet is not None:
+                path = self.join_paths(meet, parents_f, parents_b)
+                return path, self.path_cost(path)
+
+        return [], 0
+
+    @instrumented
+    def bidirectional_dijkstra_search(self, start, end_list, instruments: Optional[Instruments] = None) \
+            -> tuple[list, int] | None:
+        # Uniform cost searches from the start and, over the reverse edges, from every goal.
+        # Once the two smallest keys add up to the best path seen so far, no better one can exist.
+        if not self.supports_predecessors:
+            raise TypeError("bidirectional searches need the predecessors of the nodes")
+
+        if start in end_list:
+            return [start], 0
+
+        ends = [n for n in end_list if self.has_val(n)]
+        counter = count()
+
+        dist = ({start: 0}, {n: 0 for n in ends})
+        parents = ({start: None}, {n: None for n in ends})
+        heaps = ([(0, next(counter), start)], [(0, next(counter), n) for n in ends])
+        closed = (set(), set())
+        neighbours = (self.get_neighbours, self.get_predecessors)
+        expand = instruments.expand if instruments is not None else None
+
+        best_cost, meet = None, None
+
+        while len(heaps[0]) > 0 and len(heaps[1]) > 0:
+
+            if best_cost is not None and heaps[0][0][0] + heaps[1][0][0] >= best_cost:
+                break
+
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            other = 1 - side
+
+            d_n, _, n = heappop(heaps[side])
+            if n in closed[side] or d_n > dist[side][n]:
+                continue
+
+            closed[side].add(n)
+
+            if expand is not None:
+                expand(n, len(heaps[0]) + len(heaps[1]))
+
+            for (m, weight) in neighbours[side](n):
+                d_m = d_n + weight
+
+                if m not in dist[side] or d_m < dist[side][m]:
+                    dist[side][m] = d_m
+                    parents[side][m] = n
+                    heappush(heaps[side], (d_m, next(counter), m))
+
+                if m in dist[other] and (best_cost is None or dist[side][m] + dist[other][m] < best_cost):
+                    best_cost = dist[side][m] + dist[other][m]
+                    meet = m
+
+        if meet is None:
+            return None
+
+        path = self.join_paths(meet, parents[0], parents[1])
+        return path, self.path_cost(path)
+
     def draw(self):
+        # Imported here, they take most of the start up time and only drawing needs them.
+        import matplotlib.pyplot as plt
+        import networkx as nx
 
         nodes = self.graph.keys()
         graph = nx.Graph()
@@ -1,6 +1,7 @@
 from typing import Any
 from enum import Enum
 from src.graph.graph import Graph
+from src.graph.persistent_map import PersistentMap
 
 
 class TransactionType(Enum):
@@ -8,6 +9,7 @@ class TransactionType(Enum):
     REM_EDGE = 1
     ADD_VAL = 2
     ADD_HEUR = 3
+    REDIRECT = 4
 
 
 class ImmGraphTransaction:
@@ -32,66 +34,64 @@ class ImmGraphTransaction:
         self.t_data.append((TransactionType.ADD_HEUR, (val, heur)))
         return self
 
+    def redirect_edges(self, val, new_val) -> 'ImmGraphTransaction':
+        """
+        Every edge into val, except its loops, goes into new_val instead.
+        """
+        self.t_data.append((TransactionType.REDIRECT, (val, new_val)))
+        return self
+
 
 class ImmGraph(Graph):
+    """
+    Graph whose edits return a new graph and leave the old one as it was.
+
+    The adjacency, reverse adjacency and heuristic tables are PersistentMaps, so an edit costs
+    O(log V) instead of a copy of the whole table, and every version of the graph shares the
+    nodes it didn't change with the others. Adjacency dicts of single nodes are still copied
+    before they're edited, they only hold a handful of edges.
+    """
+
+    def __init__(self, directed=False) -> None:
+        super().__init__(directed)
+        self.graph = PersistentMap()
+        self.reverse_graph = PersistentMap()
+        self.heur = PersistentMap()
 
     def apply_transaction(self, transaction: ImmGraphTransaction) -> 'ImmGraph':
         if len(transaction.t_data) == 0:
             return self
 
+        # Edits go to editors of the maps, turned back into maps once the whole transaction is in.
         igraph = ImmGraph(self.is_directed)
-        igraph.graph = self.graph
-        igraph.heur = self.heur
-        igraph.reverse_graph = self.reverse_graph
-        graph_copy = False
-        reverse_graph_copy = False
-        heur_copy = False
+        igraph.graph = self.graph.edit()
+        igraph.reverse_graph = self.reverse_graph.edit()
+        igraph.heur = self.heur.edit()
 
         for trans_type, args in transaction.t_data:
             match trans_type:
                 case TransactionType.ADD_EDGE:
-                    if not graph_copy:
-                        igraph.graph = igraph.graph.copy()
-                        graph_copy = True
-                    if not reverse_graph_copy and self.is_directed:
-                        igraph.reverse_graph = igraph.reverse_graph.copy()
-                        reverse_graph_copy = True
                     igraph.__priv_add_edge(*args)
 
                 case TransactionType.REM_EDGE:
-                    if not graph_copy:
-                        igraph.graph = igraph.graph.copy()
-                        graph_copy = True
-                    if not reverse_graph_copy and self.is_directed:
-                        igraph.reverse_graph = igraph.reverse_graph.copy()
-                        reverse_graph_copy = True
                     igraph.__priv_remove_edge(*args)
 
                 case TransactionType.ADD_VAL:
-                    if not graph_copy:
-                        igraph.graph = igraph.graph.copy()
-                        graph_copy = True
                     igraph.__priv_add_val(*args)
 
                 case TransactionType.ADD_HEUR:
-                    if not heur_copy:
-                        igraph.heur = igraph.heur.copy()
-                        heur_copy = True
                     igraph.__priv_add_heuristic(*args)
 
+                case TransactionType.REDIRECT:
+                    igraph.__priv_redirect_edges(*args)
+
+        igraph.graph = igraph.graph.finish()
+        igraph.reverse_graph = igraph.reverse_graph.finish()
+        igraph.heur = igraph.heur.finish()
         return igraph
 
     def add_edge(self, val1, val2, weight) -> 'ImmGraph':
-        igraph = ImmGraph(self.is_directed)
-        igraph.graph = self.graph.copy()
-        if self.is_directed:
-            igraph.reverse_graph = self.reverse_graph.copy()
-        else:
-            igraph.reverse_graph = self.reverse_graph
-
-        igraph.heur = self.heur
-        igraph.__priv_add_edge(val1, val2, weight)
-        return igraph
+        return self.apply_transaction(ImmGraphTransaction().add_edge(val1, val2, weight))
 
     def __priv_add_edge(self, val1, val2, weight) -> None:
         if val1 not in self.graph:
@@ -116,35 +116,20 @@ class ImmGraph(Graph):
             self.reverse_graph[val2][val1] = weight
 
     def add_val(self, val) -> 'ImmGraph':
-        igraph = ImmGraph(self.is_directed)
-        igraph.graph = self.graph.copy()
-        igraph.reverse_graph = self.reverse_graph
-        igraph.heur = self.heur
-        igraph.__priv_add_val(val)
-        return igraph
+        return self.apply_transaction(ImmGraphTransaction().add_val(val))
 
     def __priv_add_val(self, val) -> None:
         if val not in self.graph:
             self.graph[val] = {}
 
     def add_heuristic(self, val, heur) -> 'ImmGraph':
-        igraph = ImmGraph(self.is_directed)
-        igraph.graph = self.graph
-        igraph.heur = self.heur.copy()
-        igraph.reverse_graph = self.reverse_graph
-        igraph.__priv_add_heuristic(val, heur)
-        return igraph
+        return self.apply_transaction(ImmGraphTransaction().add_heur(val, heur))
 
     def __priv_add_heuristic(self, val, heur) -> None:
         self.heur[val] = heur
 
     def remove_edge(self, val1, val2) -> 'ImmGraph':
-        igraph = ImmGraph(self.is_directed)
-        igraph.graph = self.graph.copy()
-        igraph.heur = self.heur
-        igraph.reverse_graph = self.reverse_graph.copy()
-        igraph.__priv_remove_edge(val1, val2)
-        return igraph
+        return self.apply_transaction(ImmGraphTransaction().remove_edge(val1, val2))
 
     def __priv_remove_edge(self, val1, val2) -> None:
         self.graph[val1] = self.graph[val1].copy()
@@ -156,10 +141,23 @@ class ImmGraph(Graph):
             self.reverse_graph[val2] = self.reverse_graph[val2].copy()
             del self.reverse_graph[val2][val1]
 
+    def __priv_redirect_edges(self, val, new_val) -> None:
+        for (neigh, weight) in list(self.get_predecessors(val)):
+            if neigh == val:
+                continue
+
+            self.__priv_add_edge(neigh, new_val, weight)
+            self.__priv_remove_edge(neigh, val)
+
     @staticmethod
     def wrap_graph(graph: Graph) -> 'ImmGraph':
+        """
+        Immutable view of a graph in O(1), its tables become the base of the persistent maps,
+        so the graph must not be modified afterwards.
+        """
+
         igraph = ImmGraph(graph.is_directed)
-        igraph.graph = graph.graph
-        igraph.heur = graph.heur
-        igraph.reverse_graph = graph.reverse_graph
+        igraph.graph = PersistentMap(graph.graph)
+        igraph.heur = PersistentMap(graph.heur)
+        igraph.reverse_graph = PersistentMap(graph.reverse_graph)
         return igraph
@@ -0,0 +1,107 @@
+import copy
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Iterator, Optional
+
+
+class Instruments:
+    """
+    Where searches and graph generation report what they do: counters, peaks, the time spent on
+    each phase and, optionally, a callback on every node expanded.
+
+    Everything that reports here takes an optional Instruments, and when it's left out only
+    checks it's None once per node expanded, so it costs next to nothing disabled.
+    """
+
+    def __init__(self, on_expand: Optional[Callable[[Any, int], None]] = None) -> None:
+        """
+        :param on_expand: Called with every node expanded and the size of the open list then.
+        """
+
+        self.counters: Counter[str] = Counter()
+        self.peaks: dict[str, float] = {}
+        self.timers: dict[str, float] = {}
+        self.on_expand = on_expand
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    def peak(self, name: str, value: float) -> None:
+        if name not in self.peaks or value > self.peaks[name]:
+            self.peaks[name] = value
+
+    def expand(self, node, frontier: int) -> None:
+        """
+        Reports a node expanded.
+
+        :param frontier: Size of the open list when the node was expanded.
+        """
+
+        self.counters['expanded'] += 1
+
+        if frontier > self.peaks.get('frontier', -1):
+            self.peaks['frontier'] = frontier
+
+        if self.on_expand is not None:
+            self.on_expand(node, frontier)
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[name] = self.timers.get(name, 0.0) + time.perf_counter() - start
+
+    def translated(self, convert: Callable[[Any], Any]) -> 'Instruments':
+        """
+        The same instruments, sharing every measure, but handing on_expand the nodes converted.
+        """
+
+        view = copy.copy(self)
+
+        if self.on_expand is not None:
+            on_expand = self.on_expand
+            view.on_expand = lambda node, frontier: on_expand(convert(node), frontier)
+
+        return view
+
+    def report(self) -> dict:
+        return {
+            "counters": dict(self.counters),
+            "peaks": dict(self.peaks),
+            "timers": dict(self.timers)
+        }
+
+    def __str__(self) -> str:
+        measures = [f"{name}={value}" for (name, value) in self.counters.items()]
+        measures += [f"peak {name}={value}" for (name, value) in self.peaks.items()]
+        measures += [f"{name}={value:.3f}s" for (name, value) in self.timers.items()]
+        return ", ".join(measures)
+
+
+def instrumented(search: Callable) -> Callable:
+    """
+    Reports every call of a search to the instruments passed to it, if any: the time it took,
+    and whether it found a path at all.
+    """
+
+    name = search.__name__
+
+    @wraps(search)
+    def run(graph, start, end_list, *args, instruments: Optional[Instruments] = None, **kwargs):
+        if instruments is None:
+            return search(graph, start, end_list, *args, **kwargs)
+
+        with instruments.timed(name):
+            result = search(graph, start, end_list, *args, instruments=instruments, **kwargs)
+
+        instruments.count('searches')
+        if not result or len(result[0]) == 0:
+            instruments.count('not_found')
+
+        return result
+
+    return run
@@ -0,0 +1,155 @@
+from collections import OrderedDict
+from typing import Any, Callable
+
+from src.graph.graph import Graph
+from src.graph.imm_graph import ImmGraphTransaction, TransactionType
+
+# Default amount of nodes whose adjacency is kept in memory.
+DEFAULT_MAX_CACHED = 100_000
+
+
+class LazyGraph(Graph):
+    """
+    Directed graph whose edges are only generated when a node is first visited.
+
+    `successors` is called the first time the neighbours of a node are asked for and the
+    result is memoized in an LRU cache holding at most `max_cached` nodes, so searches only
+    pay for the part of the state space they actually explore. Heuristics are computed on
+    demand by `heuristic`.
+
+    The graph is never fully known, so it can't be turned into a dict based one. Edits that
+    don't need the predecessors of a node are laid over it instead, see apply_transaction.
+    """
+
+    # Only the edges out of a node can be generated.
+    supports_predecessors = False
+
+    def __init__(self, successors: Callable[[Any], list[tuple[Any, int]]], heuristic: Callable[[Any], float],
+                 max_cached: int = DEFAULT_MAX_CACHED) -> None:
+        super().__init__(True)
+
+        self.successors = successors
+        self.heuristic = heuristic
+
+        self.max_cached = max_cached
+        self.graph: OrderedDict[Any, dict[Any, int]] = OrderedDict()
+
+        # Cache statistics.
+        self.hits = 0
+        self.misses = 0
+
+    def edges_of(self, val) -> dict[Any, int]:
+        edges = self.graph.get(val)
+
+        if edges is not None:
+            self.hits += 1
+            self.graph.move_to_end(val)
+            return edges
+
+        self.misses += 1
+
+        edges = {}
+        for (adjacent, weight) in self.successors(val):
+            edges[adjacent] = weight
+
+        if self.max_cached > 0:
+            self.graph[val] = edges
+            if len(self.graph) > self.max_cached:
+                self.graph.popitem(last=False)
+
+        return edges
+
+    def get_neighbours(self, nodo) -> list:
+        return list(self.edges_of(nodo).items())
+
+    def get_predecessors(self, nodo) -> list:
+        raise TypeError("predecessors of a lazy graph can't be generated")
+
+    def get_weight(self, val1, val2) -> int | None:
+        return self.edges_of(val1).get(val2)
+
+    def has_val(self, node) -> bool:
+        return node in self.graph
+
+    def add_edge(self, val1, val2, weight) -> None:
+        raise TypeError("edges of a lazy graph are generated, not added")
+
+    def remove_edge(self, val1, val2) -> None:
+        raise TypeError("edges of a lazy graph are generated, not removed")
+
+    def add_heuristic(self, val, heur):
+        raise TypeError("heuristics of a lazy graph are computed on demand")
+
+    def has_heuristic(self, val):
+        return True
+
+    def get_heuristic(self, val):
+        return self.heuristic(val)
+
+    def apply_transaction(self, transaction: ImmGraphTransaction) -> 'LazyGraph':
+        """
+        Same as ImmGraph.apply_transaction, the edits are laid over this graph, which is left
+        as it was. Nodes added by the transaction only have the edges added to them, the rest
+        keep generating theirs, with the edits applied on top.
+
+        The new graph caches nothing, this one already does, and a chain of edits is cheap
+        to apply again.
+        """
+
+        if len(transaction.t_data) == 0:
+            return self
+
+        added_vals = set()
+        added: dict[Any, dict[Any, int]] = {}
+        removed: dict[Any, set] = {}
+        redirects: dict[Any, Any] = {}
+        heuristics: dict[Any, float] = {}
+
+        for trans_type, args in transaction.t_data:
+            match trans_type:
+                case TransactionType.ADD_EDGE:
+                    val1, val2, weight = args
+                    added.setdefault(val1, {})[val2] = weight
+                    removed.get(val1, set()).discard(val2)
+
+                case TransactionType.REM_EDGE:
+                    val1, val2 = args
+                    added.get(val1, {}).pop(val2, None)
+                    removed.setdefault(val1, set()).add(val2)
+
+                case TransactionType.ADD_VAL:
+                    added_vals.add(args[0])
+
+                case TransactionType.ADD_HEUR:
+                    val, heur = args
+                    heuristics[val] = heur
+
+                case TransactionType.REDIRECT:
+                    val, new_val = args
+                    redirects[val] = new_val
+
+        base = self
+
+        def successors(val) -> list[tuple[Any, int]]:
+            edges = {} if val in added_vals else dict(base.edges_of(val))
+
+            for adjacent in removed.get(val, ()):
+                edges.pop(adjacent, None)
+
+            if redirects:
+                # Like ImmGraph does, loops stay where they are and redirected edges go last.
+                moved = {redirects[adjacent]: edges.pop(adjacent) for adjacent in list(edges)
+                         if adjacent in redirects and adjacent != val}
+                edges.update(moved)
+
+            edges.update(added.get(val, {}))
+            return list(edges.items())
+
+        def heuristic(val) -> float:
+            heur = heuristics.get(val)
+            return heur if heur is not None else base.get_heuristic(val)
+
+        return LazyGraph(successors, heuristic, 0)
+
+    def to_graph(self) -> Graph:
+        raise TypeError("a lazy graph is never fully generated")
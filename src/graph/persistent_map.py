@@ -0,0 +1,418 @@
+from collections.abc import ItemsView, Mapping
+from typing import Any, Iterator, Optional
+
+# Hash bits consumed by each level of the trie, so every node has up to 32 slots.
+LEVEL_BITS = 5
+LEVEL_MASK = (1 << LEVEL_BITS) - 1
+
+# Hashes are taken as unsigned 64-bit ints, once every bit was consumed the keys left
+# in a slot share their whole hash and go into a CollisionNode.
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+
+# Key of the array slots holding a child node instead of a (key, value) pair.
+CHILD = object()
+
+# Value of the keys of the base mapping removed by the trie.
+DELETED = object()
+
+MISSING = object()
+
+
+def key_hash(key) -> int:
+    return hash(key) & HASH_MASK
+
+
+class BitmapNode:
+    """
+    Trie node, with a slot for each 5 bit chunk of the hashes present in the bitmap. Slots are
+    packed in a flat array as key, value pairs, where the key is CHILD if the value is a node.
+
+    Nodes are never modified once shared: edits copy the path from the root down to the slot
+    changed and share every other node. Only the nodes created by an editor, tagged with its
+    owner token, are modified in place while the editor lasts.
+    """
+
+    __slots__ = ('bitmap', 'array', 'owner')
+
+    def __init__(self, bitmap: int, array: list, owner: Optional[object]) -> None:
+        self.bitmap = bitmap
+        self.array = array
+        self.owner = owner
+
+    def editable(self, owner: Optional[object]) -> 'BitmapNode':
+        if owner is not None and self.owner is owner:
+            return self
+        return BitmapNode(self.bitmap, self.array.copy(), owner)
+
+    def find(self, shift: int, h: int, key, default):
+        node = self
+        while type(node) is BitmapNode:
+            bit = 1 << ((h >> shift) & LEVEL_MASK)
+            if not node.bitmap & bit:
+                return default
+
+            i = 2 * (node.bitmap & (bit - 1)).bit_count()
+            k = node.array[i]
+
+            if k is CHILD:
+                node = node.array[i + 1]
+                shift += LEVEL_BITS
+            elif k is key or k == key:
+                return node.array[i + 1]
+            else:
+                return default
+
+        return node.find(shift, h, key, default)
+
+    def assoc(self, shift: int, h: int, key, value, owner: Optional[object]) -> tuple['BitmapNode', bool]:
+        """
+        :return: The node with the key set and whether the key is new.
+        """
+
+        bit = 1 << ((h >> shift) & LEVEL_MASK)
+        i = 2 * (self.bitmap & (bit - 1)).bit_count()
+
+        if not self.bitmap & bit:
+            node = self.editable(owner)
+            node.array[i:i] = (key, value)
+            node.bitmap |= bit
+            return node, True
+
+        k = self.array[i]
+        v = self.array[i + 1]
+
+        if k is CHILD:
+            child, added = v.assoc(shift + LEVEL_BITS, h, key, value, owner)
+            if child is v:
+                return self, added
+
+            node = self.editable(owner)
+            node.array[i + 1] = child
+            return node, added
+
+        if k is key or k == key:
+            if v is value:
+                return self, False
+
+            node = self.editable(owner)
+            node.array[i + 1] = value
+            return node, False
+
+        node = self.editable(owner)
+        node.array[i] = CHILD
+        node.array[i + 1] = merge_pairs(shift + LEVEL_BITS, key_hash(k), k, v, h, key, value, owner)
+        return node, True
+
+    def without(self, shift: int, h: int, key, owner: Optional[object]) -> tuple[Optional['BitmapNode'], bool]:
+        """
+        :return: The node without the key, None if it's left empty, and whether the key was there.
+        """
+
+        bit = 1 << ((h >> shift) & LEVEL_MASK)
+        if not self.bitmap & bit:
+            return self, False
+
+        i = 2 * (self.bitmap & (bit - 1)).bit_count()
+        k = self.array[i]
+        v = self.array[i + 1]
+
+        if k is CHILD:
+            child, removed = v.without(shift + LEVEL_BITS, h, key, owner)
+            if not removed:
+                return self, False
+
+            if child is not None:
+                node = self.editable(owner)
+
+                # A child left with a single pair is pulled up, so the trie stays as shallow as it can.
+                if len(child.array) == 2 and child.array[0] is not CHILD:
+                    node.array[i] = child.array[0]
+                    node.array[i + 1] = child.array[1]
+                else:
+                    node.array[i + 1] = child
+
+                return node, True
+
+        elif not (k is key or k == key):
+            return self, False
+
+        if self.bitmap == bit:
+            return None, True
+
+        node = self.editable(owner)
+        del node.array[i:i + 2]
+        node.bitmap ^= bit
+        return node, True
+
+    def pairs(self) -> Iterator[tuple[Any, Any]]:
+        array = self.array
+        for i in range(0, len(array), 2):
+            if array[i] is CHILD:
+                yield from array[i + 1].pairs()
+            else:
+                yield array[i], array[i + 1]
+
+
+class CollisionNode:
+    """
+    Leaf holding every key whose whole hash is the same, as flat key, value pairs.
+    """
+
+    __slots__ = ('array', 'owner')
+
+    def __init__(self, array: list, owner: Optional[object]) -> None:
+        self.array = array
+        self.owner = owner
+
+    def editable(self, owner: Optional[object]) -> 'CollisionNode':
+        if owner is not None and self.owner is owner:
+            return self
+        return CollisionNode(self.array.copy(), owner)
+
+    def index(self, key) -> int:
+        array = self.array
+        for i in range(0, len(array), 2):
+            if array[i] is key or array[i] == key:
+                return i
+        return -1
+
+    def find(self, shift: int, h: int, key, default):
+        i = self.index(key)
+        return default if i < 0 else self.array[i + 1]
+
+    def assoc(self, shift: int, h: int, key, value, owner: Optional[object]) -> tuple['CollisionNode', bool]:
+        i = self.index(key)
+        if i >= 0 and self.array[i + 1] is value:
+            return self, False
+
+        node = self.editable(owner)
+        if i < 0:
+            node.array += (key, value)
+        else:
+            node.array[i + 1] = value
+
+        return node, i < 0
+
+    def without(self, shift: int, h: int, key, owner: Optional[object]) -> tuple[Optional['CollisionNode'], bool]:
+        i = self.index(key)
+        if i < 0:
+            return self, False
+
+        if len(self.array) == 2:
+            return None, True
+
+        node = self.editable(owner)
+        del node.array[i:i + 2]
+        return node, True
+
+    def pairs(self) -> Iterator[tuple[Any, Any]]:
+        array = self.array
+        for i in range(0, len(array), 2):
+            yield array[i], array[i + 1]
+
+
+def merge_pairs(shift: int, h1: int, key1, value1, h2: int, key2, value2,
+                owner: Optional[object]) -> BitmapNode | CollisionNode:
+    """
+    Builds the smallest subtrie holding two keys that landed on the same slot.
+    """
+
+    if shift >= HASH_BITS:
+        return CollisionNode([key1, value1, key2, value2], owner)
+
+    slot1 = (h1 >> shift) & LEVEL_MASK
+    slot2 = (h2 >> shift) & LEVEL_MASK
+
+    if slot1 == slot2:
+        child = merge_pairs(shift + LEVEL_BITS, h1, key1, value1, h2, key2, value2, owner)
+        return BitmapNode(1 << slot1, [CHILD, child], owner)
+
+    array = [key1, value1, key2, value2] if slot1 < slot2 else [key2, value2, key1, value1]
+    return BitmapNode((1 << slot1) | (1 << slot2), array, owner)
+
+
+class PersistentMap(Mapping):
+    """
+    Immutable mapping, where setting or deleting a key returns a new map in O(log n) that
+    shares all but O(log n) of its memory with the old one.
+
+    Keys live in a hash array mapped trie, laid over an optional base mapping. The base is
+    taken as is, never copied nor modified, so wrapping a huge dict is O(1) and only the keys
+    changed since then take trie nodes. Reading goes to the trie first and then to the base.
+    """
+
+    __slots__ = ('base', 'root', 'size')
+
+    def __init__(self, base: Optional[Mapping] = None) -> None:
+        """
+        :param base: Mapping with the initial keys, it must never be modified afterwards.
+        """
+
+        self.base: Mapping = base if base is not None else {}
+        self.root: Optional[BitmapNode] = None
+        self.size = len(self.base)
+
+    def with_root(self, root: Optional[BitmapNode], size: int) -> 'PersistentMap':
+        pmap = PersistentMap.__new__(PersistentMap)
+        pmap.base = self.base
+        pmap.root = root
+        pmap.size = size
+        return pmap
+
+    def __len__(self) -> int:
+        return self.size
+
+    # Lookups are what searches spend their time on, so they go straight to the trie and the base.
+
+    def get(self, key, default=None):
+        root = self.root
+        if root is not None:
+            value = root.find(0, hash(key) & HASH_MASK, key, MISSING)
+            if value is not MISSING:
+                return default if value is DELETED else value
+
+        return self.base.get(key, default)
+
+    def __getitem__(self, key):
+        root = self.root
+        if root is not None:
+            value = root.find(0, hash(key) & HASH_MASK, key, MISSING)
+            if value is not MISSING:
+                if value is DELETED:
+                    raise KeyError(key)
+                return value
+
+        return self.base[key]
+
+    def __contains__(self, key) -> bool:
+        root = self.root
+        if root is not None:
+            value = root.find(0, hash(key) & HASH_MASK, key, MISSING)
+            if value is not MISSING:
+                return value is not DELETED
+
+        return key in self.base
+
+    def __iter__(self) -> Iterator:
+        for (key, _) in self.pairs():
+            yield key
+
+    def items(self) -> 'PersistentMapItems':
+        return PersistentMapItems(self)
+
+    def pairs(self) -> Iterator[tuple[Any, Any]]:
+        if self.root is None:
+            yield from self.base.items()
+            return
+
+        root = self.root
+        for (key, value) in self.base.items():
+            changed = root.find(0, key_hash(key), key, MISSING)
+            if changed is MISSING:
+                yield key, value
+            elif changed is not DELETED:
+                yield key, changed
+
+        base = self.base
+        for (key, value) in root.pairs():
+            if value is not DELETED and key not in base:
+                yield key, value
+
+    def set(self, key, value) -> 'PersistentMap':
+        editor = self.edit()
+        editor[key] = value
+        return editor.finish()
+
+    def delete(self, key) -> 'PersistentMap':
+        editor = self.edit()
+        del editor[key]
+        return editor.finish()
+
+    def edit(self) -> 'PersistentMapEditor':
+        return PersistentMapEditor(self)
+
+
+class PersistentMapItems(ItemsView):
+
+    def __iter__(self) -> Iterator[tuple[Any, Any]]:
+        return self._mapping.pairs()
+
+
+class PersistentMapEditor:
+    """
+    Mutable view of a PersistentMap, to apply a batch of edits and turn them into a new map.
+
+    Trie nodes created by the editor are modified in place until finish is called, so a batch
+    only copies each node it touches once, no matter how many of its keys change. The map it
+    was taken from is never modified.
+    """
+
+    __slots__ = ('pmap', 'root', 'size', 'owner')
+
+    def __init__(self, pmap: PersistentMap) -> None:
+        self.pmap = pmap
+        self.root = pmap.root
+        self.size = pmap.size
+
+        # Token tagging the nodes this editor may modify in place.
+        self.owner = object()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def get(self, key, default=None):
+        if self.root is not None:
+            value = self.root.find(0, key_hash(key), key, MISSING)
+            if value is not MISSING:
+                return default if value is DELETED else value
+
+        return self.pmap.base.get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, MISSING) is not MISSING
+
+    def __setitem__(self, key, value) -> None:
+        h = key_hash(key)
+
+        if self.root is None:
+            self.root = BitmapNode(0, [], self.owner)
+
+        previous = self.root.find(0, h, key, MISSING)
+        self.root, _ = self.root.assoc(0, h, key, value, self.owner)
+
+        if previous is DELETED or (previous is MISSING and key not in self.pmap.base):
+            self.size += 1
+
+    def __delitem__(self, key) -> None:
+        if key not in self:
+            raise KeyError(key)
+
+        h = key_hash(key)
+        if key in self.pmap.base:
+            # Keys of the base can't be dropped from it, they're shadowed instead.
+            if self.root is None:
+                self.root = BitmapNode(0, [], self.owner)
+            self.root, _ = self.root.assoc(0, h, key, DELETED, self.owner)
+        else:
+            self.root, _ = self.root.without(0, h, key, self.owner)
+
+        self.size -= 1
+
+    def finish(self) -> PersistentMap:
+        """
+        Returns the map with every edit made, the editor can't be used afterwards.
+        """
+
+        # Dropping the token, so the nodes of the returned map are never modified again.
+        self.owner = None
+
+        if self.root is self.pmap.root:
+            return self.pmap
+        return self.pmap.with_root(self.root, self.size)
@@ -0,0 +1,218 @@
+import argparse
+import copy
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from itertools import product
+from typing import Iterator, Optional
+
+from src.mapper.graph_cache import GraphCache
+from src.mapper.path_gen import ALGORITHMS, ANYTIME_ALGORITHMS, algorithms_for_backend
+from src.mapper.solver import SolveOptions, add_solve_arguments, build_graph, solve, solve_options
+
+# A (map path, algorithm, cars) combination to solve.
+Job = tuple[str, str, int]
+
+# Graph cache of the current worker process, set once when the worker starts.
+worker_cache: GraphCache | None = None
+
+
+def init_batch_worker(cache_dir: str) -> None:
+    global worker_cache
+    worker_cache = GraphCache(cache_dir=cache_dir)
+
+
+def prepare_map(map_path: str, options: SolveOptions) -> None:
+    """
+    Generates the graph of a map into the cache shared by every worker, so the jobs of the map
+    load it instead of generating it again.
+    """
+
+    build_graph(map_path, options.compact, options.lazy, worker_cache, options.workers, options.vectorized,
+                options.physics)
+
+
+def run_job(index: int, job: Job, options: SolveOptions) -> dict:
+    """
+    Solves one job, a failure is reported in the result instead of raised.
+    """
+
+    map_path, algorithm, cars = job
+    options.cache = worker_cache
+
+    try:
+        result = solve(map_path, algorithm, cars, options)
+    except Exception as error:
+        return job_error(index, job, error)
+
+    result["job"] = index
+    return result
+
+
+def job_error(index: int, job: Job, error: BaseException | str) -> dict:
+    map_path, algorithm, cars = job
+
+    return {
+        "job": index,
+        "map": os.path.basename(map_path),
+        "algorithm": algorithm,
+        "cars": cars,
+        "error": error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+    }
+
+
+def job_matrix(map_paths: list[str], algorithms: list[str], cars: list[int]) -> list[Job]:
+    """
+    Every combination of a map, an algorithm and an amount of cars, grouped by map.
+    """
+
+    return list(product(map_paths, algorithms, cars))
+
+
+def run_pool(pool: ProcessPoolExecutor, jobs: dict[int, Job], options: SolveOptions) \
+        -> Iterator[tuple[int, Optional[dict]]]:
+    """
+    Runs jobs on a pool, first generating the graph of every map and then, as soon as a map is
+    ready, solving all of its jobs.
+
+    :return: Every job index along with its result as it completes, or with None if the pool broke
+             before the job was done.
+    """
+
+    by_map: dict[str, list[int]] = {}
+    for (index, (map_path, _, _)) in jobs.items():
+        by_map.setdefault(map_path, []).append(index)
+
+    # Future -> the map it generates, or the index of the job it solves.
+    pending = {pool.submit(prepare_map, map_path, options): map_path for map_path in by_map}
+
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            item = pending.pop(future)
+            error = future.exception()
+
+            if isinstance(error, BrokenProcessPool):
+                for index in by_map[item] if isinstance(item, str) else [item]:
+                    yield index, None
+
+            elif isinstance(item, str):
+                for index in by_map[item]:
+                    if error is not None:
+                        yield index, job_error(index, jobs[index], error)
+                        continue
+
+                    try:
+                        pending[pool.submit(run_job, index, jobs[index], options)] = index
+                    except BrokenProcessPool:
+                        yield index, None
+
+            else:
+                yield item, future.result() if error is None else job_error(item, jobs[item], error)
+
+
+def run_batch(jobs: list[Job], options: Optional[SolveOptions] = None, processes: Optional[int] = None,
+              cache_dir: Optional[str] = None) -> Iterator[dict]:
+    """
+    Solves many jobs on a process pool, yielding their results as they complete.
+
+    The graph of each map is generated once, into a GraphCache on disk shared by every worker,
+    and the jobs of that map load it from there. A job that fails is reported with an "error"
+    entry and the batch goes on. If a worker dies, every job the broken pool still had is run
+    again, one at a time, so only the job that takes its worker down again is lost.
+
+    :param jobs: Jobs to solve, see job_matrix.
+    :param options: How to solve them, the cache set in them is ignored.
+    :param processes: Worker processes, every core by default.
+    :param cache_dir: Where to keep the generated graphs, a temporary folder by default.
+    :return: The result of solve for every job, with the index of the job in "job".
+    """
+
+    # Workers use the disk cache, the graphs of the in memory one must not be shipped to them.
+    options = copy.copy(options) if options is not None else SolveOptions()
+    options.cache = None
+
+    with tempfile.TemporaryDirectory() if cache_dir is None else nullcontext(cache_dir) as folder:
+        broken: dict[int, Job] = {}
+
+        with ProcessPoolExecutor(processes, initializer=init_batch_worker, initargs=(folder,)) as pool:
+            for (index, result) in run_pool(pool, dict(enumerate(jobs)), options):
+                if result is None:
+                    broken[index] = jobs[index]
+                else:
+                    yield result
+
+        pool = None
+        try:
+            for (index, job) in broken.items():
+                if pool is None:
+                    pool = ProcessPoolExecutor(1, initializer=init_batch_worker, initargs=(folder,))
+
+                for (_, result) in run_pool(pool, {index: job}, options):
+                    if result is None:
+                        pool.shutdown()
+                        pool = None
+                        result = job_error(index, job, "worker process died")
+
+                    yield result
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+
+def map_files(paths: list[str]) -> list[str]:
+    """
+    Expands folders into the maps they hold.
+    """
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, file) for file in os.listdir(path) if file.startswith('map'))
+        else:
+            files.append(path)
+
+    return files
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Solves every combination of maps, algorithms and amounts of "
+                                                 "cars on a process pool, printing each result as a JSON line.")
+    parser.add_argument("--maps", nargs="+", default=["docs/maps"], help="maps, or folders with maps, to solve")
+    parser.add_argument("--algorithms", nargs="+", choices=list(ALGORITHMS), default=list(ALGORITHMS),
+                        help="algorithms to run")
+    parser.add_argument("--cars", nargs="+", type=int, default=[1], help="amounts of cars")
+    parser.add_argument("--processes", type=int, help="worker processes, every core by default")
+    add_solve_arguments(parser)
+    parser.add_argument("--output", help="file to write the JSON lines to, stdout by default")
+    args = parser.parse_args()
+
+    # The cache set is ignored, the workers share the one in --cache-dir instead.
+    options = solve_options(args)
+
+    algorithms = algorithms_for_backend(args.algorithms, args.backend)
+
+    # Rejected up front, every job of an algorithm that can't stop early would fail on it anyway.
+    if args.time_budget is not None or args.max_expansions is not None:
+        unbounded = [algorithm for algorithm in algorithms if algorithm not in ANYTIME_ALGORITHMS]
+        if len(unbounded) > 0:
+            parser.error(f"{', '.join(unbounded)} can't stop early, --time-budget and --max-expansions "
+                         f"only apply to {', '.join(sorted(ANYTIME_ALGORITHMS))}")
+
+    jobs = job_matrix(map_files(args.maps), algorithms, args.cars)
+    print(f"Solving {len(jobs)} jobs...", file=sys.stderr)
+
+    with open(args.output, "w") if args.output else nullcontext(sys.stdout) as out:
+        for result in run_batch(jobs, options, args.processes, args.cache_dir):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+
+if __name__ == '__main__':
+    SystemExit(main())
@@ -0,0 +1,137 @@
+import hashlib
+import os
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Any, Optional
+
+from src.graph.compact_graph import CompactGraph
+from src.graph.graph import Graph
+from src.mapper.path_gen import CircuitNode, GENERATOR_VERSION
+
+
+def graph_key(map_path: str, *parts: Any) -> str:
+    """
+    Builds the cache key of the graph generated for a map. The key changes whenever the
+    map file contents or the generator version change, so stale graphs are never reused.
+
+    :param map_path: Path to the map file.
+    :param parts: Anything else the generated graph depends on.
+    """
+
+    digest = hashlib.sha256()
+
+    with open(map_path, "rb") as map_file:
+        digest.update(map_file.read())
+
+    digest.update(f"generator:{GENERATOR_VERSION}".encode())
+    for part in parts:
+        digest.update(f";{part}".encode())
+
+    return digest.hexdigest()
+
+
+class GraphCache:
+    """
+    Cache of generated graphs, kept in memory with LRU eviction and optionally
+    written to disk in the compact binary format of CompactGraph.
+
+    Graphs handed out by the cache are shared, callers must not mutate them.
+    """
+
+    def __init__(self, max_entries: int = 8, cache_dir: Optional[str] = None) -> None:
+        """
+        :param max_entries: How many graphs to keep in memory.
+        :param cache_dir: Folder where graphs are stored on disk, None to keep them in memory only.
+        """
+
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries: OrderedDict[str, Graph | CompactGraph] = OrderedDict()
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def file_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.graph")
+
+    def get(self, key: str, compact: bool) -> Optional[Graph | CompactGraph]:
+        """
+        Looks a graph up, first in memory and then on disk.
+
+        :param key: Key returned by graph_key.
+        :param compact: Whether the graph is wanted in the compact backend.
+        """
+
+        mem_key = f"{key}:{'compact' if compact else 'dict'}"
+
+        graph = self.entries.get(mem_key)
+        if graph is not None:
+            self.entries.move_to_end(mem_key)
+            return graph
+
+        if self.cache_dir is None or not os.path.exists(self.file_path(key)):
+            return None
+
+        with open(self.file_path(key), "rb") as graph_file:
+            try:
+                graph = CompactGraph.load(graph_file, attrgetter('state'), CircuitNode.from_state)
+            except (ValueError, EOFError):
+                return None
+
+        if not compact:
+            graph = graph.to_graph()
+
+        self.remember(mem_key, graph)
+        return graph
+
+    def put(self, key: str, graph: Graph | CompactGraph) -> None:
+        """
+        Stores a freshly generated graph.
+
+        :param key: Key returned by graph_key.
+        :param graph: The graph, with its heuristics already set.
+        """
+
+        compact = isinstance(graph, CompactGraph)
+        self.remember(f"{key}:{'compact' if compact else 'dict'}", graph)
+
+        if self.cache_dir is None:
+            return
+
+        if not compact:
+            # The on disk format is always the compact one.
+            graph = self.compact_copy(graph)
+
+        # Written to a temporary file first, so a crash never leaves a truncated graph behind.
+        tmp_path = f"{self.file_path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as graph_file:
+            graph.save(graph_file)
+
+        os.replace(tmp_path, self.file_path(key))
+
+    def remember(self, mem_key: str, graph: Graph | CompactGraph) -> None:
+        self.entries[mem_key] = graph
+        self.entries.move_to_end(mem_key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    @staticmethod
+    def compact_copy(graph: Graph) -> CompactGraph:
+        compact = CompactGraph(graph.is_directed, attrgetter('state'), CircuitNode.from_state)
+
+        for node in graph.nodes():
+            compact.add_val(node)
+
+        for node in graph.nodes():
+            for (adjacent, weight) in graph.get_neighbours(node):
+                compact.add_edge(node, adjacent, weight)
+
+            if graph.has_heuristic(node):
+                compact.add_heuristic(node, graph.get_heuristic(node))
+
+        return compact
+
+
+# Cache shared by every Simulator unless told otherwise.
+default_cache = GraphCache()
@@ -1,28 +1,59 @@
-import copy
 import math
 import random
+from array import array
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
 
-from rich.console import Console
+import numpy as np
 
 from src.graph.graph import Graph
+from src.graph.compact_graph import CompactGraph, pack_state, unpack_state
+from src.graph.lazy_graph import LazyGraph, DEFAULT_MAX_CACHED
 from src.parser.parser import MapPiece
 
+from src.models.physics import PhysicsProfile
 from src.models.race_car import RaceCar, Coordinates
 
 from src.graph.imm_graph import ImmGraph, ImmGraphTransaction
+from src.graph.instrumentation import Instruments
 
-console = Console()
+# Bumped whenever a change to the generation rules changes the graphs produced, so cached graphs get discarded.
+GENERATOR_VERSION = 3
+
+# Every acceleration a car can apply, in the order the moves are expanded.
+ACCELERATIONS = ((0, -1), (0, 1), (-1, 0), (1, 0), (1, -1), (-1, -1), (1, 1), (-1, 1), (0, 0))
+
+OUTSIDE_TRACK = MapPiece.OUTSIDE_TRACK.value
+FINISH = MapPiece.FINISH.value
 
 
 class CircuitNode:
+    __slots__ = ('car', 'piece', '_gen', '_hash')
+
     def __init__(self, car: RaceCar, piece: MapPiece):
         self.car: RaceCar = car
         self.piece: MapPiece = piece
-        self.gen: int = 0
+        self._gen: int = 0
+        self._hash: int | None = None
+
+    @property
+    def gen(self) -> int:
+        return self._gen
+
+    @gen.setter
+    def gen(self, gen: int) -> None:
+        self._gen = gen
+        self._hash = None
 
     def __hash__(self):
-        return hash(self.car) + hash(self.piece) + hash(self.gen)
+        # Nodes are dict keys everywhere, so the hash is computed once, from the whole state.
+        # The car of a node is never moved, only its generation changes, which resets the hash.
+        # The car is packed as in RaceCar.hash_key.
+        if self._hash is None:
+            self._hash = hash(self.car.hash_key() + (self.piece.value, self._gen))
+        return self._hash
 
     def __eq__(self, other):
         return (self.car == other.car) and (self.piece == other.piece) and (self.gen == other.gen)
@@ -30,6 +61,34 @@ class CircuitNode:
     def __str__(self):
         return f"car:{self.car}; piece:{self.piece}; gen:{self.gen}"
 
+    @property
+    def state(self) -> tuple[int, int, int, int, int, int]:
+        """
+        Plain (x, y, vx, vy, piece, gen) tuple of the node, used by the compact graph backend.
+        """
+        car = self.car
+        return car.pos.x, car.pos.y, car.vel.x, car.vel.y, self.piece.value, self._gen
+
+    @classmethod
+    def from_state(cls, state: tuple[int, int, int, int, int, int]) -> 'CircuitNode':
+        x, y, vx, vy, piece, gen = state
+
+        node = cls(
+            RaceCar(Coordinates(x, y), Coordinates(vx, vy)),
+            MapPiece(piece)
+        )
+        node.gen = gen
+
+        return node
+
+
+def nodes_at(circuit: list[list[MapPiece]], pos_list: list[tuple[int, int]]) -> list[CircuitNode]:
+    """
+    Builds the stopped car nodes at the given positions, e.g. the start and finish nodes.
+    """
+
+    return [CircuitNode.from_state((x, y, 0, 0, circuit[y][x].value, 0)) for (x, y) in pos_list]
+
 
 def is_out_of_bounds(car: RaceCar, circuit_x: int, circuit_y: int) -> bool:
     if (0 <= car.pos.x < circuit_x) and (0 <= car.pos.y < circuit_y):
@@ -60,19 +119,150 @@ def calc_manhatten_dist_heur(pos1: tuple[int, int], pos_list: list[tuple[int, in
     return lesser
 
 
-def calc_heur(node: CircuitNode, finish_pos_list: list[tuple[int, int]]) -> float:
-    if node.piece is MapPiece.FINISH:
+# Every search algorithm, by the name shown to the user, and the Graph method implementing it.
+ALGORITHMS = {
+    "DFS": "dfs_search",
+    "IDDFS": "iddfs_search",
+    "BFS": "bfs_search",
+    "Greedy": "greedy_search",
+    "A*": "a_star_search",
+    "ARA*": "anytime_a_star_search",
+    "UCS": "uniform_cost_search",
+    "Dial": "dial_search",
+    "Bi-BFS": "bidirectional_bfs_search",
+    "Bi-Dijkstra": "bidirectional_dijkstra_search"
+}
+
+# Algorithms that also search over the reverse edges, so they need graphs that support predecessors.
+BIDIRECTIONAL_ALGORITHMS = {"Bi-BFS", "Bi-Dijkstra"}
+
+# Algorithms that can stop early with the best path found so far, and take a deadline and max_expansions.
+ANYTIME_ALGORITHMS = {"ARA*"}
+
+# Graph backends, by the name given on the command line.
+BACKENDS = ["dict", "compact", "lazy"]
+
+
+def algorithms_for_backend(algorithms: list[str], backend: str) -> list[str]:
+    """
+    The algorithms that can run on a graph backend, in the same order.
+    """
+
+    if backend == "lazy":
+        # Lazy graphs can't list predecessors, the bidirectional searches can't run on them.
+        return [algorithm for algorithm in algorithms if algorithm not in BIDIRECTIONAL_ALGORITHMS]
+
+    return list(algorithms)
+
+# Heuristic of the cells the finish can't be reached from.
+UNREACHABLE = 1_000_000
+
+
+def finish_distances(circuit: list[list[MapPiece]], finish_pos_list: list[tuple[int, int]]) -> list[list[int]]:
+    """
+    Runs a multi-source BFS from every finish cell over the track, moving like a car
+    does on each step of its path, one cell in any of the 8 directions.
+
+    :param circuit: The parsed circuit.
+    :param finish_pos_list: Positions of the finish cells.
+    :return: Table indexed as [y][x] with the least amount of cells between each position
+             and the finish, UNREACHABLE for the cells outside the track or cut off from it.
+    """
+
+    height = len(circuit)
+    width = len(circuit[0])
+
+    distances = [[UNREACHABLE] * len(row) for row in circuit]
+    queue = deque()
+
+    for (x, y) in finish_pos_list:
+        distances[y][x] = 0
+        queue.append((x, y))
+
+    while len(queue) > 0:
+        x, y = queue.popleft()
+        n_distance = distances[y][x] + 1
+
+        for (dx, dy) in ACCELERATIONS:
+            n_x, n_y = x + dx, y + dy
+
+            if not (0 <= n_x < width and 0 <= n_y < height):
+                continue
+
+            if circuit[n_y][n_x] is MapPiece.OUTSIDE_TRACK or distances[n_y][n_x] <= n_distance:
+                continue
+
+            distances[n_y][n_x] = n_distance
+            queue.append((n_x, n_y))
+
+    return distances
+
+
+def min_moves(distance: int, speed: int) -> int:
+    """
+    Least amount of moves needed to travel a distance. Speed grows by at most one per move,
+    so k moves cover at most k * speed + k * (k + 1) / 2 cells.
+
+    :param distance: Distance in cells, as in finish_distances.
+    :param speed: Current speed, the largest absolute velocity component.
+    """
+
+    if distance <= 0:
         return 0
-    elif node.piece is MapPiece.OUTSIDE_TRACK:
-        return 1_000_000
 
-    return calc_manhatten_dist_heur((node.car.pos.x, node.car.pos.y), finish_pos_list)
+    b = speed + 0.5
+    moves = max(1, math.ceil(math.sqrt(b * b + 2 * distance) - b))
 
+    # Rounding fix-ups, the closed form may be off by one either way.
+    while moves > 1 and (moves - 1) * speed + (moves - 1) * moves // 2 >= distance:
+        moves -= 1
+    while moves * speed + moves * (moves + 1) // 2 < distance:
+        moves += 1
 
-def resolve_collisions(a_path_list: list[tuple[list[CircuitNode], int]], graph: Graph, finish_nodes: list[CircuitNode],
-                       algorithm: str) -> list[tuple[list[CircuitNode], int]]:
+    return moves
+
+
+def calc_state_heur(state: tuple[int, int, int, int, int, int], distances: list[list[int]]) -> int:
+    """
+    Lower bound on the amount of moves left from a state to the finish.
+
+    :param state: (x, y, vx, vy, piece, gen) state.
+    :param distances: Table returned by finish_distances.
+    """
+
+    x, y, vx, vy, piece, gen = state
+
+    if piece == FINISH:
+        return 0
+    elif piece == OUTSIDE_TRACK:
+        # A crash puts the car back on its exit for free, stopped, see crash_exit.
+        x, y, vx, vy = x + vx, y + vy, 0, 0
+
+    distance = distances[y][x]
+    if distance >= UNREACHABLE:
+        return UNREACHABLE
+
+    return min_moves(distance, max(abs(vx), abs(vy)))
+
+
+def calc_heur(node: CircuitNode, distances: list[list[int]]) -> int:
+    return calc_state_heur(node.state, distances)
+
+
+def resolve_collisions(a_path_list: list[tuple[list[CircuitNode], int]], graph: Graph | CompactGraph | LazyGraph,
+                       finish_nodes: list[CircuitNode], algorithm: str,
+                       instruments: Instruments | None = None,
+                       search_options: dict | None = None) -> list[tuple[list[CircuitNode], int]]:
     assert graph.is_directed
-    immgraph_list = [ImmGraph.wrap_graph(graph) for i in range(len(a_path_list))]
+
+    if search_options is None:
+        search_options = {}
+
+    # Immutable views are only built once a collision actually shows up, since compact graphs
+    # have to be expanded into a dict based one before they can be mutated. Lazy graphs lay
+    # the edits over themselves instead, and stay lazy.
+    immgraph_list: list[ImmGraph | LazyGraph | None] = [None] * len(a_path_list)
+    base_graph = None
     path_list = [path for path, cost in a_path_list]
 
     i = 0
@@ -93,23 +283,21 @@ def resolve_collisions(a_path_list: list[tuple[list[CircuitNode], int]], graph:
             if path[i + 1].car.pos not in pos_map:
                 pos_map[path[i + 1].car.pos] = path[i]
             else:
-                igraph = immgraph_list[j]
+                if base_graph is None:
+                    base_graph = graph if isinstance(graph, LazyGraph) else ImmGraph.wrap_graph(graph.to_graph())
+
+                igraph = immgraph_list[j] if immgraph_list[j] is not None else base_graph
                 trans = ImmGraphTransaction()
                 node = path[i]
-                g_node = copy.deepcopy(node)
+                g_node = CircuitNode.from_state(node.state)
                 g_node.gen += 1
                 trans.add_val(g_node)
                 trans.add_heur(g_node, igraph.get_heuristic(node))
 
-                neighbors_to, neighbors_from = igraph.get_all_associated(node)
-                for neigh, weight in neighbors_from:
-                    if neigh == node:
-                        continue
-                    trans.add_edge(neigh, g_node, weight)
-                    trans.remove_edge(neigh, node)
+                trans.redirect_edges(node, g_node)
 
                 rem_pos_set = set()
-                for neigh, weight in neighbors_to:
+                for neigh, weight in igraph.get_neighbours(node):
                     if neigh == node:
                         trans.add_edge(g_node, g_node, weight)
                         continue
@@ -124,18 +312,11 @@ def resolve_collisions(a_path_list: list[tuple[list[CircuitNode], int]], graph:
                             rem_pos_set.add(n_node.car.pos)
 
                 igraph = igraph.apply_transaction(trans)
-                s_path = None
-                match algorithm:
-                    case "DFS":
-                        s_path, _ = igraph.dfs_search(node, finish_nodes)
-                    case "BFS":
-                        s_path, _ = igraph.bfs_search(node, finish_nodes)
-                    case "A*":
-                        s_path, _ = igraph.a_star_search(node, finish_nodes)
-                    case "Greedy":
-                        s_path, _ = igraph.greedy_search(node, finish_nodes)
-                    case _:
-                        raise RuntimeError(f"received unknown algo:{algorithm}")
+                if algorithm not in ALGORITHMS:
+                    raise RuntimeError(f"received unknown algo:{algorithm}")
+
+                s_path, _ = getattr(igraph, ALGORITHMS[algorithm])(node, finish_nodes, instruments=instruments,
+                                                                   **search_options)
 
                 n_path = []
 
@@ -160,77 +341,335 @@ def resolve_collisions(a_path_list: list[tuple[list[CircuitNode], int]], graph:
     return ret_list
 
 
+# Frontier layers smaller than this are expanded in process, shipping them to workers costs more.
+PARALLEL_MIN_LAYER = 4096
+
+# Edges grouped in rows, (row nodes, offsets, targets, weights). Row i holds the edges of
+# nodes[i], to targets[j] with weights[j], for j in range(offsets[i], offsets[i + 1]).
+EdgeRows = tuple[array, array, array, array]
+
+class ChunkEdges:
+    """
+    Edges a chunk of expanded states adds to the graph, see chunk_edges.
+
+    States are numbered in the order the graph first sees them, which is the order the ids of
+    a CompactGraph are handed out in. The edges are grouped in rows by their source, and in
+    reverse rows by their destination, every row keeping the order its edges are added in,
+    see EdgeRows.
+    """
+
+    __slots__ = ('keys', 'rows', 'reverse_rows', 'reached')
+
+    def __init__(self, keys: list, rows: EdgeRows, reverse_rows: EdgeRows | None, reached: list[tuple]) -> None:
+        # Every state the edges go through, packed for a CompactGraph.
+        self.keys = keys
+
+        self.rows = rows
+        self.reverse_rows = reverse_rows
+
+        # Every state the edges reach, once, to be expanded in the next layer.
+        self.reached = reached
+
+
+def edge_rows(rows: dict[int, tuple[array, array]]) -> EdgeRows:
+    """
+    Flattens the rows built by chunk_edges, in the order they were started.
+    """
+
+    nodes = array('i', rows.keys())
+    offsets = array('i', [0])
+    targets = array('i')
+    weights = array('H')
+
+    for (row_targets, row_weights) in rows.values():
+        targets.extend(row_targets)
+        weights.extend(row_weights)
+        offsets.append(len(targets))
+
+    return nodes, offsets, targets, weights
+
+
+def chunk_edges(states: list[tuple], expansions: list[list[tuple[tuple, tuple | None]]], packed: bool) -> ChunkEdges:
+    """
+    Turns the expansion of a chunk of states into the edges they add to the graph, already
+    numbered and grouped, so merging them takes no work per state.
+
+    :param packed: Whether the edges go to a CompactGraph, which wants the states packed, see
+                   pack_state, and builds its reverse edges by itself.
+    """
+
+    index: dict[tuple, int] = {}
+    keys = []
+
+    def local(state: tuple) -> int:
+        i = index.get(state)
+        if i is None:
+            i = index[state] = len(keys)
+            keys.append(state)
+        return i
+
+    rows: dict[int, tuple[array, array]] = {}
+    reverse_rows: dict[int, tuple[array, array]] = {}
+
+    def add_edge(src: int, dst: int, weight: int) -> None:
+        row = rows.get(src)
+        if row is None:
+            row = rows[src] = (array('i'), array('H'))
+        row[0].append(dst)
+        row[1].append(weight)
+
+        if not packed:
+            row = reverse_rows.get(dst)
+            if row is None:
+                row = reverse_rows[dst] = (array('i'), array('H'))
+            row[0].append(src)
+            row[1].append(weight)
+
+    reached = {}
+    for (state, moves) in zip(states, expansions):
+        for (last_state, crash_state) in moves:
+            s = local(state)
+
+            if crash_state is not None:
+                c = local(crash_state)
+                add_edge(s, c, 25)
+                add_edge(c, local(last_state), 0)
+
+            else:
+                add_edge(s, local(last_state), 1)
+
+            if last_state[4] != FINISH:
+                reached[last_state] = None
+
+    if packed:
+        keys = [pack_state(key) for key in keys]
+
+    return ChunkEdges(keys, edge_rows(rows), None if packed else edge_rows(reverse_rows), list(reached))
+
+
+# Circuit of the current worker process, set once when the worker starts.
+worker_rays: 'RayTable | None' = None
+worker_grid: np.ndarray | None = None
+worker_physics: PhysicsProfile | None = None
+worker_packed = False
+
+
+def init_expansion_worker(circuit: list[list[MapPiece]], grid: np.ndarray | None,
+                          physics: PhysicsProfile | None, packed: bool) -> None:
+    global worker_rays, worker_grid, worker_physics, worker_packed
+    worker_rays = RayTable(circuit)
+    worker_grid = grid
+    worker_physics = physics
+    worker_packed = packed
+
+
+def expand_chunk(states: list[tuple]) -> ChunkEdges:
+    if worker_grid is not None:
+        expansions = expand_state_batch(worker_grid, states, worker_physics)
+    else:
+        expansions = [worker_rays.expand(state, worker_physics) for state in states]
+
+    return chunk_edges(states, expansions, worker_packed)
+
+
+def expansion_pool(circuit: list[list[MapPiece]], grid: np.ndarray | None, physics: PhysicsProfile | None,
+                   workers: int, packed: bool) -> ProcessPoolExecutor | nullcontext:
+    """
+    Pool of worker processes for expand_layer, each one getting its own copy of the circuit.
+    A do nothing context when there's a single worker.
+    """
+
+    if workers <= 1:
+        return nullcontext()
+
+    return ProcessPoolExecutor(workers, initializer=init_expansion_worker,
+                               initargs=(circuit, grid, physics, packed))
+
+
+def expand_layer(rays: 'RayTable', grid: np.ndarray | None, physics: PhysicsProfile | None, states: list[tuple],
+                 pool: ProcessPoolExecutor | None, workers: int, packed: bool) -> list[ChunkEdges]:
+    """
+    Runs expand_state on every state and turns the moves into edges with chunk_edges, splitting
+    the states among the pool workers if there's enough of them.
+
+    :param rays: Ray table of the circuit.
+    :param grid: Piece grid of the circuit, to expand the states in NumPy batches, or None.
+    :param physics: Speed limits of the cars, or None.
+    :param packed: Whether the states are handed packed, for a CompactGraph.
+    :return: The edges of every chunk, in the order of the states.
+    """
+
+    if pool is None or len(states) < PARALLEL_MIN_LAYER:
+        if grid is not None:
+            expansions = expand_state_batch(grid, states, physics)
+        else:
+            expansions = [rays.expand(state, physics) for state in states]
+
+        return [chunk_edges(states, expansions, packed)]
+
+    # A few chunks per worker, so a slow chunk doesn't leave the rest idle.
+    size = -(-len(states) // (workers * 4))
+    chunks = [states[i:i + size] for i in range(0, len(states), size)]
+
+    return list(pool.map(expand_chunk, chunks))
+
+
 def generate_paths_graph(circuit: list[list[MapPiece]], start_pos_list: list[tuple[int, int]],
-                         finish_pos_list: list[tuple[int, int]], graph=None, closed_set=None) -> tuple[Graph, set]:
+                         finish_pos_list: list[tuple[int, int]], graph=None,
+                         closed_set=None, with_heuristics: bool = True, workers: int = 1,
+                         vectorized: bool = False, physics: PhysicsProfile | None = None,
+                         instruments: Instruments | None = None) -> tuple[Graph | CompactGraph, set]:
+    """
+    Generates the graph of every move a car can make from the start positions.
+
+    :param graph: Graph to add the moves to, a new dict based one by default.
+    :param closed_set: States already expanded, which won't be expanded again.
+    :param with_heuristics: Whether to also compute the heuristic of every node.
+    :param workers: Worker processes expanding the moves and turning them into edges, 1 to do it
+                    in this process. Only merging the edges into the graph, the merge_layer timer,
+                    stays in this process.
+    :param vectorized: Whether to expand each layer of states in NumPy batches.
+    :param physics: Speed limits of the cars, moves breaking them are left out of the graph.
+    :param instruments: Where to report the states expanded, the size of each layer and the time
+                        spent expanding, merging and computing heuristics.
+    """
+
     if graph is None:
         graph = Graph(True)
 
+    timed = instruments.timed if instruments is not None else lambda name: nullcontext()
+
     if closed_set is None:
-        # Set of nodes already expanded.
+        # Set of states already expanded.
         closed_set = set()
 
-    # Queue with the nodes being processed.
-    open_queue = deque()
+    packed = isinstance(graph, CompactGraph)
 
-    for start_pos in start_pos_list:
-        start_node = CircuitNode(
-            RaceCar(
-                pos=Coordinates(x=start_pos[0], y=start_pos[1])
-            ),
-            circuit[start_pos[1]][start_pos[0]]
-        )
-        open_queue.append(start_node)
+    if packed:
+        # The compact backend stores the states as they are, no node is ever built.
+        def merge(edges: ChunkEdges) -> None:
+            ids = np.array(graph.key_ids(edges.keys), dtype=np.int32)
+            nodes, offsets, targets = (np.frombuffer(part, dtype=np.int32) for part in edges.rows[:3])
 
-    while len(open_queue) > 0:
+            # Edges are grouped by source, which is the order the CSR arrays keep them in anyway.
+            graph.add_id_edges(np.repeat(ids[nodes], np.diff(offsets)).tolist(), ids[targets].tolist(),
+                               edges.rows[3])
+    else:
+        # One CircuitNode per state, only built when the state first reaches the graph.
+        nodes: dict[tuple, CircuitNode] = {}
 
-        node: CircuitNode = open_queue.popleft()
+        def as_node(state: tuple) -> CircuitNode:
+            node = nodes.get(state)
+            if node is None:
+                node = nodes[state] = CircuitNode.from_state(state)
+            return node
 
-        if node in closed_set:
-            continue
+        def merge(edges: ChunkEdges) -> None:
+            graph.add_edge_rows([as_node(key) for key in edges.keys], edges.rows, edges.reverse_rows)
 
-        next_node_paths = expand_track_moves(circuit, node)
+    # Breadth first, one layer of states at a time, so each layer can be expanded in parallel.
+    # The workers also turn the moves into edges, numbered as the graph first sees them, and
+    # merging the chunks back in order adds the same edges, in the same order, as a plain FIFO
+    # queue would.
+    layer = [(x, y, 0, 0, circuit[y][x].value, 0) for (x, y) in start_pos_list]
 
-        for (start_node, last_node, node_crashed, crash_node) in next_node_paths:
+    rays = RayTable(circuit)
+    grid = piece_grid(circuit) if vectorized else None
 
-            last_node.car.set_acc_zero()
-            if last_node.piece == MapPiece.FINISH:
-                last_node.car.set_vel_zero()
+    with expansion_pool(circuit, grid, physics, workers, packed) as pool:
+        while len(layer) > 0:
 
-            if crash_node is not None:
-                crash_node.car.set_acc_zero()
-                graph.add_edge(node, crash_node, 25)
-                graph.add_edge(crash_node, last_node, 0)
+            if instruments is not None:
+                instruments.count('layers')
+                instruments.peak('layer', len(layer))
 
-            else:
-                graph.add_edge(node, last_node, 1)
+            # Every state of the layer not expanded yet, once.
+            with timed('expand_states'):
+                pending = list(dict.fromkeys(state for state in layer if state not in closed_set))
+                chunks = expand_layer(rays, grid, physics, pending, pool, workers, packed)
 
-            if last_node not in closed_set and last_node.piece is not MapPiece.FINISH:
-                open_queue.append(last_node)
+            if instruments is not None:
+                instruments.count('states', len(pending))
 
-        closed_set.add(node)
+            with timed('merge_layer'):
+                for edges in chunks:
+                    merge(edges)
 
-    set_heuristics(graph, finish_pos_list)
+                closed_set.update(pending)
+
+                layer = [state for edges in chunks for state in edges.reached if state not in closed_set]
+
+    if with_heuristics:
+        with timed('set_heuristics'):
+            set_heuristics(graph, finish_distances(circuit, finish_pos_list))
 
     return graph, closed_set
 
 
-def set_heuristics(graph: Graph, finish_pos_list: list[tuple[int, int]]):
-    for node in graph.graph.keys():
-        graph.heur[node] = calc_heur(node, finish_pos_list)
+def lazy_paths_graph(circuit: list[list[MapPiece]], start_pos_list: list[tuple[int, int]],
+                     finish_pos_list: list[tuple[int, int]], max_cached: int = DEFAULT_MAX_CACHED,
+                     physics: PhysicsProfile | None = None) -> LazyGraph:
+    """
+    Lazy counterpart of generate_paths_graph, moves are only expanded once a search reaches them.
+
+    :param max_cached: How many nodes keep their expanded moves in memory.
+    :param physics: Speed limits of the cars.
+    """
+
+    distances = finish_distances(circuit, finish_pos_list)
+    rays = RayTable(circuit)
+
+    def successors(node: CircuitNode) -> list[tuple[CircuitNode, int]]:
+        state = node.state
+
+        if state[4] == OUTSIDE_TRACK:
+            return [(CircuitNode.from_state(crash_exit(circuit, state)), 0)]
+
+        edges = []
+        for (last_state, crash_state) in rays.expand(state, physics):
+            if crash_state is not None:
+                edges.append((CircuitNode.from_state(crash_state), 25))
+            else:
+                edges.append((CircuitNode.from_state(last_state), 1))
+
+        return edges
 
+    return LazyGraph(successors, lambda node: calc_heur(node, distances), max_cached)
 
-def get_node_path(circuit: list[list[MapPiece]], node: CircuitNode):
-    n_x: int = node.car.pos.x
-    n_y: int = node.car.pos.y
 
-    end_x: int = n_x + node.car.vel.x
-    end_y: int = n_y + node.car.vel.y
+def set_heuristics(graph: Graph | CompactGraph, distances: list[list[int]]):
+    if isinstance(graph, CompactGraph):
+        # Straight from the packed states, without building any node.
+        for (node_id, key) in enumerate(graph.keys):
+            graph.heur[node_id] = calc_state_heur(unpack_state(key), distances)
+        return
 
-    x_dir: int = max(-1, min(end_x - n_x, 1))
-    y_dir: int = max(-1, min(end_y - n_y, 1))
+    for node in graph.nodes():
+        graph.add_heuristic(node, calc_heur(node, distances))
 
-    last_node: CircuitNode = copy.deepcopy(node)
 
+def trace_move(circuit: list[list[MapPiece]], state: tuple[int, int, int, int, int, int]) \
+        -> tuple[tuple[int, int, int, int, int, int], tuple[int, int, int, int, int, int] | None]:
+    """
+    Moves a car along its velocity, one cell at a time, on plain state tuples.
+
+    :param circuit: The parsed circuit.
+    :param state: (x, y, vx, vy, piece, gen) state, with the velocity already accelerated.
+    :return: The state where the car stops and, if it left the track, the state where it crashed, see crash_exit.
+    """
+
+    x, y, vx, vy, piece, gen = state
+
+    end_x: int = x + vx
+    end_y: int = y + vy
+
+    x_dir: int = max(-1, min(vx, 1))
+    y_dir: int = max(-1, min(vy, 1))
+
+    height = len(circuit)
+    width = len(circuit[0])
+
+    n_x, n_y = x, y
     while n_x != end_x or n_y != end_y:
 
         if n_x != end_x:
@@ -239,120 +678,240 @@ def get_node_path(circuit: list[list[MapPiece]], node: CircuitNode):
         if n_y != end_y:
             n_y += y_dir
 
-        if (n_x >= len(circuit[0])) or (n_x < 0) or (n_y >= len(circuit)) or (n_y < 0):
-            return last_node, True, None
+        if (n_x >= width) or (n_x < 0) or (n_y >= height) or (n_y < 0):
+            return (x, y, vx, vy, piece, gen), None
+
+        n_piece = circuit[n_y][n_x]
+
+        if n_piece is MapPiece.OUTSIDE_TRACK:
+            return (x, y, 0, 0, piece, gen), (n_x, n_y, x - n_x, y - n_y, OUTSIDE_TRACK, gen)
+
+        if n_piece is MapPiece.FINISH:
+            return (n_x, n_y, 0, 0, FINISH, gen), None
+
+        x, y, piece = n_x, n_y, n_piece.value
+
+    return (x, y, vx, vy, piece, gen), None
+
+
+def crash_exit(circuit: list[list[MapPiece]], crash_state: tuple[int, int, int, int, int, int]) \
+        -> tuple[int, int, int, int, int, int]:
+    """
+    State a crashed car is put back on the track in, stopped on the last cell it went through.
+    Crash states keep the step from the cell they crashed into back to that one in place of
+    their velocity, so every crash has a single exit.
+
+    :param crash_state: Crash state returned by trace_move.
+    """
+
+    x, y, dx, dy, piece, gen = crash_state
+    return x + dx, y + dy, 0, 0, circuit[y + dy][x + dx].value, gen
+
+
+def expand_state(circuit: list[list[MapPiece]], state: tuple[int, int, int, int, int, int],
+                 physics: PhysicsProfile | None = None) \
+        -> list[tuple[tuple[int, int, int, int, int, int], tuple[int, int, int, int, int, int] | None]]:
+    """
+    Computes every successor of a state, one per acceleration.
+
+    :param circuit: The parsed circuit.
+    :param state: (x, y, vx, vy, piece, gen) state to expand.
+    :param physics: Speed limits of the car, accelerations breaking them are skipped.
+    :return: List of (last state, crash state or None) pairs, empty for finish states.
+    """
+
+    return [trace_move(circuit, move) for move in accelerated_moves(state, physics)]
+
+
+def accelerated_moves(state: tuple[int, int, int, int, int, int], physics: PhysicsProfile | None = None) \
+        -> list[tuple[int, int, int, int, int, int]]:
+    """
+    The state with every acceleration allowed by the physics applied to its velocity, none for finish states.
+    """
+
+    x, y, vx, vy, piece, gen = state
+
+    if piece == FINISH:
+        return []
+
+    moves = [(x, y, vx + ax, vy + ay, piece, gen) for (ax, ay) in ACCELERATIONS]
+
+    if physics is not None and physics.bounded:
+        moves = [move for move in moves if physics.allows(move[2], move[3])]
 
-        if circuit[n_y][n_x] is MapPiece.OUTSIDE_TRACK:
-            n_node = copy.deepcopy(last_node)
-            n_node.piece = circuit[n_y][n_x]
+    return moves
 
-            n_node.car.pos.x = n_x
-            n_node.car.pos.y = n_y
 
-            last_node.car.set_vel_zero()
-            last_node.car.set_acc_zero()
+# Default amount of rays a RayTable keeps.
+DEFAULT_MAX_RAYS = 500_000
 
-            return last_node, True, n_node
 
-        if circuit[n_y][n_x] is MapPiece.FINISH:
-            last_node.piece = circuit[n_y][n_x]
+class RayTable:
+    """
+    Memo of trace_move, keyed by the (x, y, vx, vy) ray a car travels. Neighbouring states
+    trace mostly the same rays, since every acceleration of one state is a different velocity
+    of another, so each ray is only walked once.
 
-            last_node.car.pos.x = n_x
-            last_node.car.pos.y = n_y
+    The piece and generation of a state don't change where its car ends up, they're only
+    copied to the resulting states. The table keeps the states traced the first time and
+    hands them back as they are while they match, which they almost always do, since the
+    piece of a state is the one of its cell and most states are of generation 0. Once full,
+    the oldest rays are evicted first.
+    """
 
-            return last_node, False, None
+    def __init__(self, circuit: list[list[MapPiece]], max_rays: int = DEFAULT_MAX_RAYS) -> None:
+        self.circuit = circuit
+        self.max_rays = max_rays
 
-        last_node.car.pos.x = n_x
-        last_node.car.pos.y = n_y
-        last_node.piece = circuit[n_y][n_x]
+        self.rays: dict[tuple[int, int, int, int], tuple[tuple, tuple | None]] = {}
 
-    return last_node, False, None
+    def __len__(self) -> int:
+        return len(self.rays)
 
+    def trace(self, state: tuple[int, int, int, int, int, int]) \
+            -> tuple[tuple[int, int, int, int, int, int], tuple[int, int, int, int, int, int] | None]:
+        """
+        Same as trace_move, from the table.
+        """
 
-def expand_track_moves(circuit: list[list[MapPiece]], circuit_node: CircuitNode):
-    list_paths = []
+        x, y, vx, vy, piece, gen = state
+        ray = (x, y, vx, vy)
+        traced = self.rays.get(ray)
 
-    if circuit_node.piece is MapPiece.FINISH:
-        return list_paths
+        if traced is None:
+            traced = trace_move(self.circuit, state)
 
-    # Up #
+            if len(self.rays) >= self.max_rays:
+                del self.rays[next(iter(self.rays))]
+            self.rays[ray] = traced
 
-    node = copy.deepcopy(circuit_node)
-    node.car.accel_up()
+            return traced
 
-    last_node, is_crashed, crash_node = get_node_path(circuit, node)
+        last_state, crash_state = traced
+        last_x, last_y, last_vx, last_vy, last_piece, last_gen = last_state
 
-    list_paths.append((node, last_node, is_crashed, crash_node))
+        # A car that didn't leave its cell keeps the piece of the state it came from.
+        stayed = last_x == x and last_y == y
 
-    # Down #
+        if last_gen == gen and (not stayed or last_piece == piece):
+            return traced
 
-    node = copy.deepcopy(circuit_node)
-    node.car.accel_down()
+        last_state = (last_x, last_y, last_vx, last_vy, piece if stayed else last_piece, gen)
 
-    last_node, is_crashed, crash_node = get_node_path(circuit, node)
+        if crash_state is None:
+            return last_state, None
 
-    list_paths.append((node, last_node, is_crashed, crash_node))
+        return last_state, crash_state[:4] + (OUTSIDE_TRACK, gen)
 
-    # Left #
+    def expand(self, state: tuple[int, int, int, int, int, int], physics: PhysicsProfile | None = None) \
+            -> list[tuple[tuple[int, int, int, int, int, int], tuple[int, int, int, int, int, int] | None]]:
+        """
+        Same as expand_state, from the table.
+        """
 
-    node = copy.deepcopy(circuit_node)
-    node.car.accel_left()
+        trace = self.trace
+        return [trace(move) for move in accelerated_moves(state, physics)]
 
-    last_node, is_crashed, crash_node = get_node_path(circuit, node)
 
-    list_paths.append((node, last_node, is_crashed, crash_node))
+def piece_grid(circuit: list[list[MapPiece]]) -> np.ndarray:
+    """
+    Circuit as a (height, width) array of piece values, for expand_state_batch.
+    """
 
-    # Right #
+    return np.array([[piece.value for piece in row] for row in circuit], dtype=np.int8)
 
-    node = copy.deepcopy(circuit_node)
-    node.car.accel_right()
 
-    last_node, is_crashed, crash_node = get_node_path(circuit, node)
+def expand_state_batch(grid: np.ndarray, states: list[tuple[int, int, int, int, int, int]],
+                       physics: PhysicsProfile | None = None) \
+        -> list[list[tuple[tuple[int, int, int, int, int, int], tuple[int, int, int, int, int, int] | None]]]:
+    """
+    Vectorized expand_state over a whole list of states. Every acceleration of every state is
+    traced at once, one cell per round, each round only working on the moves still in flight.
 
-    list_paths.append((node, last_node, is_crashed, crash_node))
+    :param grid: Table returned by piece_grid.
+    :param states: (x, y, vx, vy, piece, gen) states to expand.
+    :param physics: Speed limits of the cars, accelerations breaking them are skipped.
+    :return: The expansion of every state, exactly as expand_state would return it.
+    """
 
-    # Top-Right #
+    if len(states) == 0:
+        return []
 
-    node = copy.deepcopy(circuit_node)
-    node.car.accel_top_right()
+    frontier = np.array(states, dtype=np.int64).reshape(-1, 6)
+    moving = frontier[:, 4] != FINISH
 
-    last_node, is_crashed, crash_node = get_node_path(circuit, node)
+    # One move per (state, acceleration), in the order of ACCELERATIONS.
+    moves = np.repeat(frontier[moving], len(ACCELERATIONS), axis=0)
+    moves[:, 2:4] += np.tile(np.array(ACCELERATIONS, dtype=np.int64), (np.count_nonzero(moving), 1))
 
-    list_paths.append((node, last_node, is_crashed, crash_node))
+    # Amount of moves left of every state.
+    counts = np.zeros(len(frontier), dtype=np.int64)
+    counts[moving] = len(ACCELERATIONS)
 
-    # Top-Left #
+    if physics is not None and physics.bounded:
+        allowed = physics.allows(moves[:, 2], moves[:, 3])
+        counts[moving] = allowed.reshape(-1, len(ACCELERATIONS)).sum(axis=1)
+        moves = moves[allowed]
 
-    node = copy.deepcopy(circuit_node)
-    node.car.accel_top_left()
+    x, y, vx, vy, piece, gen = (moves[:, i].copy() for i in range(6))
+    end_x, end_y = x + vx, y + vy
+    x_dir, y_dir = np.sign(vx), np.sign(vy)
+    steps = np.maximum(np.abs(vx), np.abs(vy))
 
-    last_node, is_crashed, crash_node = get_node_path(circuit, node)
+    last_vx, last_vy = vx.copy(), vy.copy()
+    crashed = np.zeros(len(moves), dtype=bool)
+    crash_x, crash_y = np.zeros_like(x), np.zeros_like(y)
 
-    list_paths.append((node, last_node, is_crashed, crash_node))
+    height, width = grid.shape
+    active = np.flatnonzero(steps > 0)
 
-    # Down-Right #
+    step = 0
+    while active.size > 0:
+        step += 1
 
-    node = copy.deepcopy(circuit_node)
-    node.car.accel_down_right()
+        n_x = x[active] + x_dir[active] * (x[active] != end_x[active])
+        n_y = y[active] + y_dir[active] * (y[active] != end_y[active])
 
-    last_node, is_crashed, crash_node = get_node_path(circuit, node)
+        # Moves leaving the circuit stop at their last cell, keeping their velocity.
+        inside = (n_x >= 0) & (n_x < width) & (n_y >= 0) & (n_y < height)
+        active, n_x, n_y = active[inside], n_x[inside], n_y[inside]
 
-    list_paths.append((node, last_node, is_crashed, crash_node))
+        n_piece = grid[n_y, n_x]
 
-    # Down-Left #
+        wall = n_piece == OUTSIDE_TRACK
+        hit = active[wall]
+        crashed[hit] = True
+        crash_x[hit], crash_y[hit] = n_x[wall], n_y[wall]
+        last_vx[hit], last_vy[hit] = 0, 0
 
-    node = copy.deepcopy(circuit_node)
-    node.car.accel_down_left()
+        finish = n_piece == FINISH
+        done = active[finish]
+        x[done], y[done], piece[done] = n_x[finish], n_y[finish], FINISH
+        last_vx[done], last_vy[done] = 0, 0
 
-    last_node, is_crashed, crash_node = get_node_path(circuit, node)
+        going = ~(wall | finish)
+        active = active[going]
+        x[active], y[active], piece[active] = n_x[going], n_y[going], n_piece[going]
 
-    list_paths.append((node, last_node, is_crashed, crash_node))
+        active = active[steps[active] > step]
 
-    # Middle #
+    # Back to tuples of plain ints, converting whole columns at once.
+    last_states = zip(x.tolist(), y.tolist(), last_vx.tolist(), last_vy.tolist(), piece.tolist(), gen.tolist())
+    crash_states = [None] * len(moves)
 
-    node = copy.deepcopy(circuit_node)
+    # Crashed moves are still on their last cell, which their crash state steps back to.
+    hit = np.flatnonzero(crashed)
+    back_x, back_y = x[hit] - crash_x[hit], y[hit] - crash_y[hit]
+    for (i, crash_state) in zip(hit.tolist(), zip(crash_x[hit].tolist(), crash_y[hit].tolist(), back_x.tolist(),
+                                                   back_y.tolist(), repeat(OUTSIDE_TRACK), gen[hit].tolist())):
+        crash_states[i] = crash_state
 
-    last_node, is_crashed, crash_node = get_node_path(circuit, node)
+    pairs = list(zip(last_states, crash_states))
 
-    list_paths.append((node, last_node, is_crashed, crash_node))
+    expansions = []
+    first = 0
+    for count in counts.tolist():
+        expansions.append(pairs[first:first + count])
+        first += count
 
-    return list_paths
+    return expansions
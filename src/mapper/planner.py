@@ -0,0 +1,237 @@
+from heapq import heappop, heappush
+from itertools import count
+from typing import Any
+
+from src.graph.graph import Graph
+from src.graph.compact_graph import CompactGraph
+from src.graph.instrumentation import Instruments
+from src.graph.lazy_graph import LazyGraph
+from src.mapper.reservations import ReservationTable
+
+# Timesteps cooperative_paths plans at a time, the reservation table holds at most this many.
+RESERVATION_WINDOW = 32
+
+
+def node_cell(node) -> tuple[int, int]:
+    return node.car.pos.x, node.car.pos.y
+
+
+def path_steps(path: list) -> list[tuple[int, tuple[int, int], tuple[int, int] | None]]:
+    """
+    Every (timestep, cell, previous cell) step a path takes up, in the form ReservationTable
+    takes them. A car stopped on its start cell until it first moves is still waiting to go in,
+    as every car is at timestep 0, and takes up no cell. Once it moved, coming back to the start
+    state, like crashing on the first move, takes up the start cell like any other.
+    """
+
+    start = path[0]
+
+    steps = []
+    previous = None
+    waiting = True
+    for (t, node) in enumerate(path):
+        if waiting and node == start:
+            continue
+
+        waiting = False
+
+        cell = node_cell(node)
+        steps.append((t, cell, previous))
+        previous = cell
+
+    return steps
+
+
+def cost_to_go(graph: Graph | CompactGraph | LazyGraph, finish_nodes: list) -> dict[Any, int] | None:
+    """
+    Exact cost from every node to the closest finish, with a uniform cost search over the
+    reverse edges. Ignoring the other cars, it's a perfect heuristic for space_time_a_star.
+
+    :return: Cost of every node the finish can be reached from, or None if the graph
+             can't list the predecessors of its nodes.
+    """
+
+    # Lazy graphs only know the successors of their nodes.
+    if not graph.supports_predecessors:
+        return None
+
+    costs = {node: 0 for node in finish_nodes if graph.has_val(node)}
+
+    tie = count()
+    heap = [(0, next(tie), node) for node in costs]
+
+    while heap:
+        cost, _, node = heappop(heap)
+        if cost > costs[node]:
+            continue
+
+        for (previous, weight) in graph.get_predecessors(node):
+            n_cost = cost + weight
+            if previous not in costs or n_cost < costs[previous]:
+                costs[previous] = n_cost
+                heappush(heap, (n_cost, next(tie), previous))
+
+    return costs
+
+
+def space_time_a_star(graph: Graph | CompactGraph | LazyGraph, start, finish_nodes: list,
+                      reservations: ReservationTable, car: int, costs: dict[Any, int] | None = None,
+                      instruments: Instruments | None = None, start_time: int = 0,
+                      entered: bool = False) -> tuple[list, int] | None:
+    """
+    A* over (node, timestep) pairs, which never moves into a cell reserved at the timestep it
+    would get there, nor swaps cells with another car. Waiting is only possible the way the
+    rules allow it, stopped, with no acceleration, which on the start cell, before the car
+    first moves, means it hasn't gone in yet, see path_steps.
+
+    Nothing is reserved past the horizon of the reservations, from then on time makes no
+    difference, so every later timestep is folded into horizon + 1 and the search stays finite.
+
+    :param graph: Graph to search, it's never modified.
+    :param start: Start node.
+    :param finish_nodes: Nodes where the search ends.
+    :param reservations: Reservations of the other cars.
+    :param car: Car being searched, its own reservations don't get in its way.
+    :param costs: Table returned by cost_to_go, the graph heuristic is used if None.
+    :param instruments: Where to report every (node, timestep) pair expanded.
+    :param start_time: Timestep the car is at the start node.
+    :param entered: Whether the car already went in, the start node only waits off the board if not.
+    :return: The path found from the start node and its cost, or None if every path runs into another car.
+    """
+
+    finish_set = set(finish_nodes)
+    horizon = reservations.horizon
+    expand = instruments.expand if instruments is not None else None
+
+    if costs is not None:
+        if start not in costs:
+            return None
+        heuristic = costs.__getitem__
+    else:
+        heuristic = graph.get_heuristic
+
+    # Keys are (node, timestep, whether the car went in), the start node is off the board until it does.
+    g_costs: dict[tuple[Any, int, bool], int] = {(start, start_time, entered): 0}
+    parents: dict[tuple[Any, int, bool], tuple[Any, int, bool] | None] = {(start, start_time, entered): None}
+
+    tie = count()
+    h = heuristic(start)
+    heap = [(h, h, next(tie), 0, start, start_time, entered)]
+
+    while heap:
+        _, _, _, g, node, t, entered = heappop(heap)
+
+        if g > g_costs[(node, t, entered)]:
+            continue
+
+        if node in finish_set:
+            path = []
+            key = (node, t, entered)
+            while key is not None:
+                path.append(key[0])
+                key = parents[key]
+
+            path.reverse()
+            return path, g
+
+        if expand is not None:
+            expand(node, len(heap))
+
+        n_t = t + 1 if t <= horizon else t
+        cell = node_cell(node)
+
+        for (adjacent, weight) in graph.get_neighbours(node):
+            if costs is not None and adjacent not in costs:
+                continue
+
+            n_entered = entered or adjacent != start
+
+            # The cell the car leaves is only taken up once it went in.
+            previous = cell if entered else None
+            if n_entered and not reservations.can_move(t + 1, previous, node_cell(adjacent), car):
+                continue
+
+            key = (adjacent, n_t, n_entered)
+            n_g = g + weight
+
+            if key not in g_costs or n_g < g_costs[key]:
+                g_costs[key] = n_g
+                parents[key] = (node, t, entered)
+
+                h = heuristic(adjacent)
+                heappush(heap, (n_g + h, h, next(tie), n_g, adjacent, n_t, n_entered))
+
+    return None
+
+
+def cooperative_paths(a_path_list: list[tuple[list, int]], graph: Graph | CompactGraph | LazyGraph,
+                      finish_nodes: list, instruments: Instruments | None = None,
+                      window: int = RESERVATION_WINDOW) -> list[tuple[list, int]]:
+    """
+    Multi car planner, an alternative to resolve_collisions built on windowed cooperative A*.
+
+    Time is planned a window of timesteps at a time. In every window the cars are planned one
+    after the other, in order, each one reserving in a ReservationTable the cell it's in at every
+    timestep of the window. The path a car already has is kept if it runs into no reservation,
+    nor swaps cells with another car, otherwise the rest of it is searched again with
+    space_time_a_star, from where the car is when the window starts. Once every car is planned,
+    the timesteps before the next window are released, so the table only ever holds a window of
+    every car.
+
+    The graph is never modified, only the cars that actually conflict are searched again, and
+    they all share the same cost_to_go table, so any amount of cars can be planned on the same
+    graph. The cars searched again get the optimal path that avoids the reservations, whatever
+    the algorithm that found the paths given, so a car that kept, say, an IDDFS path can cost
+    much more than the ones searched again.
+
+    :param a_path_list: Path and cost of every car, as found by a single car search.
+    :param graph: Graph the paths were found in.
+    :param finish_nodes: Nodes where the cars finish.
+    :param instruments: Where to report the cars searched again and what their searches expand.
+    :param window: Timesteps planned at a time.
+    :return: Path and cost of every car, in the same order.
+    """
+
+    if window < 1:
+        raise ValueError("the window must be at least 1 timestep")
+
+    reservations = ReservationTable()
+    costs = None
+
+    resolved = list(a_path_list)
+
+    start_time = 0
+    while any(len(path) > start_time + 1 for (path, _) in resolved):
+        end_time = start_time + window
+
+        for (car, (path, cost)) in enumerate(resolved):
+
+            # The step at the start of the window was reserved by the window before.
+            steps = [step for step in path_steps(path) if start_time < step[0] <= end_time]
+
+            if reservations.conflicts(car, steps):
+                if costs is None:
+                    costs = cost_to_go(graph, finish_nodes) or {}
+
+                if instruments is not None:
+                    instruments.count('replanned')
+
+                entered = any(node != path[0] for node in path[1:start_time + 1])
+                found = space_time_a_star(graph, path[start_time], finish_nodes, reservations, car, costs or None,
+                                          instruments, start_time, entered)
+
+                # Cars boxed in by the others keep their path, collisions and all.
+                if found is not None:
+                    path = path[:start_time] + found[0]
+                    cost = graph.path_cost(path) if len(path) > 1 else 0
+                    resolved[car] = (path, cost)
+
+                    steps = [step for step in path_steps(path) if start_time < step[0] <= end_time]
+
+            reservations.reserve_path(car, steps)
+
+        # Every car is planned up to the end of the window, only its last timestep is checked again.
+        reservations.release_before(end_time)
+        start_time = end_time
+
+    return resolved
@@ -0,0 +1,132 @@
+from collections import defaultdict
+from typing import Hashable, Sequence
+
+
+class ReservationTable:
+    """
+    Space-time reservations of the cells of a circuit, for planning many cars at once.
+
+    A car reserves the cell it's in at every timestep, so two cars can't be in the same cell at
+    once, and since a swap is two cars trading the cells they held a timestep before, swaps are
+    caught from the same reservations. Reservations are kept per timestep, so lookups and
+    inserts take O(1), and both every reservation of a car and every timestep already past can
+    be released in bulk, so planning over many timesteps only keeps the ones still ahead.
+
+    Steps are (timestep, cell, ...) tuples, anything past the cell is ignored, so the steps of
+    a path can be reserved as they are.
+    """
+
+    def __init__(self) -> None:
+        # Timestep -> cell -> car holding it.
+        self.cells: defaultdict[int, dict[Hashable, int]] = defaultdict(dict)
+
+        # Car -> every list of steps it reserved, kept as given instead of copied.
+        self.owned: defaultdict[int, list[Sequence[tuple]]] = defaultdict(list)
+
+        # Last timestep with a reservation, as long as nothing is released.
+        self.horizon = 0
+
+    def __len__(self) -> int:
+        return sum(len(cells) for cells in self.cells.values())
+
+    def reserve(self, car: int, t: int, cell: Hashable) -> None:
+        self.reserve_path(car, [(t, cell)])
+
+    def reserve_path(self, car: int, steps: Sequence[tuple]) -> None:
+        """
+        Reserves every (timestep, cell, ...) step of a path for a car.
+        """
+
+        cells = self.cells
+        horizon = self.horizon
+
+        for step in steps:
+            t = step[0]
+            cells[t][step[1]] = car
+
+            if t > horizon:
+                horizon = t
+
+        self.horizon = horizon
+        self.owned[car].append(steps)
+
+    def holder(self, t: int, cell: Hashable) -> int | None:
+        cells = self.cells.get(t)
+        return None if cells is None else cells.get(cell)
+
+    def is_free(self, t: int, cell: Hashable, car: int | None = None) -> bool:
+        """
+        Whether a car may be in a cell at a timestep, cells held by the car itself are free to it.
+        """
+
+        holder = self.holder(t, cell)
+        return holder is None or holder == car
+
+    def can_move(self, t: int, previous: Hashable | None, cell: Hashable, car: int | None = None) -> bool:
+        """
+        Whether a car may move from one cell to another arriving at a timestep, without ending
+        up in a reserved cell nor swapping cells with another car.
+
+        :param previous: Cell the car leaves, None if it wasn't in any.
+        """
+
+        if not self.is_free(t, cell, car):
+            return False
+
+        if previous is None or previous == cell:
+            return True
+
+        # Whoever gets to the cell left, swaps cells with this car if it came from the cell reached.
+        other = self.holder(t, previous)
+        return other is None or other == car or self.holder(t - 1, cell) != other
+
+    def conflicts(self, car: int, steps: Sequence[tuple[int, Hashable, Hashable | None]]) -> bool:
+        """
+        Whether any (timestep, cell, previous cell) step of a path runs into the reservations of other cars.
+        """
+
+        return not all(self.can_move(t, previous, cell, car) for (t, cell, previous) in steps)
+
+    def release(self, car: int) -> None:
+        """
+        Releases every reservation of a car.
+        """
+
+        cells = self.cells
+
+        for steps in self.owned.pop(car, ()):
+            for step in steps:
+                t, cell = step[0], step[1]
+                entries = cells.get(t)
+
+                # Skipping what was released already, or taken over by another car since.
+                if entries is None or entries.get(cell) != car:
+                    continue
+
+                del entries[cell]
+                if len(entries) == 0:
+                    del cells[t]
+
+    def release_before(self, t: int) -> None:
+        """
+        Releases every reservation of the timesteps before t, once planning has moved past them.
+        Swaps are caught from the same reservations, so they're released alike.
+        """
+
+        cells = self.cells
+
+        for past in list(cells):
+            if past < t:
+                del cells[past]
+
+        for car in list(self.owned):
+            kept = []
+            for steps in self.owned[car]:
+                ahead = [step for step in steps if step[0] >= t]
+                if len(ahead) > 0:
+                    kept.append(ahead)
+
+            if len(kept) > 0:
+                self.owned[car] = kept
+            else:
+                del self.owned[car]
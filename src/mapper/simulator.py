@@ -1,63 +1,65 @@
 from typing import Callable, Optional
 
-from src.mapper.path_gen import generate_paths_graph, CircuitNode, resolve_collisions
+from src.graph.instrumentation import Instruments
+from src.mapper.graph_cache import GraphCache, default_cache
+from src.mapper.path_gen import CircuitNode, ALGORITHMS
 from src.mapper.simulation import Simulation
+from src.mapper.solver import build_graph, find_paths
+from src.models.physics import PhysicsProfile
 from src.mapper.tiles import TileMap
 
-from src.models.race_car import RaceCar, Coordinates
-
-from src.parser.parser import parse_map
-
 from src.graph.graph import Graph
+from src.graph.compact_graph import CompactGraph
+from src.graph.lazy_graph import LazyGraph
 
 
 class Simulator:
 
-    def __init__(self, map_path: str, algorithm: str, cars: int) -> None:
+    def __init__(self, map_path: str, algorithm: str, cars: int, compact: bool = False, lazy: bool = False,
+                 cache: Optional[GraphCache] = default_cache, workers: int = 1, vectorized: bool = False,
+                 physics: Optional[PhysicsProfile] = None, cooperative: bool = False,
+                 instruments: Optional[Instruments] = None, search_options: Optional[dict] = None,
+                 time_budget: Optional[float] = None) -> None:
 
         self.map = map_path
         self.algorithm = algorithm
         self.cars = cars  # Todo #
 
+        # Whether collisions between cars are solved by the cooperative planner, instead of resolve_collisions.
+        # The cars it searches again always get an optimal path, whatever the algorithm.
+        self.cooperative = cooperative
+
+        # Where generating the graph and the searches report to, if anywhere.
+        self.instruments = instruments
+
+        # Extra options of every search, like the budget of an anytime algorithm.
+        self.search_options = search_options
+
+        # Seconds an anytime algorithm may take to find every path, if bounded.
+        self.time_budget = time_budget
+
         self.path = None
         self.cost = None
 
         self.tile_map = TileMap(self.map)
-        self.graph, self.start_nodes, self.finish_nodes = self.build_graph(self.map)
+        self.graph, self.start_nodes, self.finish_nodes = self.build_graph(self.map, compact, lazy, cache, workers,
+                                                                           vectorized, physics, instruments)
 
         self.algorithm_map: dict[str, Callable[[CircuitNode, list[CircuitNode]], Optional[tuple[list, int]]]] = {
-            "DFS": self.graph.dfs_search,
-            "BFS": self.graph.bfs_search,
-            "Greedy": self.graph.greedy_search,
-            "A*": self.graph.a_star_search
+            name: getattr(self.graph, method) for (name, method) in ALGORITHMS.items()
         }
 
     @staticmethod
-    def build_graph(map_path: str) -> tuple[Graph, list[CircuitNode], list[CircuitNode]]:
+    def build_graph(map_path: str, compact: bool = False, lazy: bool = False, cache: Optional[GraphCache] = None,
+                    workers: int = 1, vectorized: bool = False, physics: Optional[PhysicsProfile] = None,
+                    instruments: Optional[Instruments] = None) \
+            -> tuple[Graph | CompactGraph | LazyGraph, list[CircuitNode], list[CircuitNode]]:
         """
-        Given the path to a map, this method generates the corresponding graph.
-        This graph contains every possible play in the game, for every position.
-
-        :param map_path: Map path.
+        Given the path to a map, this method generates the corresponding graph,
+        see solver.build_graph.
         """
 
-        circuit, start_pos_list, finish_pos_list = parse_map(map_path)
-
-        graph, closed_set = generate_paths_graph(circuit, start_pos_list, finish_pos_list)
-
-        start_nodes: list[CircuitNode] = list(map(
-            lambda pos:
-            CircuitNode(RaceCar(pos=Coordinates(x=pos[0], y=pos[1])), circuit[pos[1]][pos[0]]),
-            start_pos_list
-        ))
-
-        finish_nodes: list[CircuitNode] = list(map(
-            lambda pos:
-            CircuitNode(RaceCar(pos=Coordinates(x=pos[0], y=pos[1])), circuit[pos[1]][pos[0]]),
-            finish_pos_list
-        ))
-
-        return graph, start_nodes, finish_nodes
+        return build_graph(map_path, compact, lazy, cache, workers, vectorized, physics, instruments)
 
     @staticmethod
     def path_to_tuple(path: list[CircuitNode]) -> list[tuple[int, int]]:
@@ -76,23 +78,8 @@ class Simulator:
         the Simulation class.
         """
 
-        # Getting the text corresponding algorithm function.
-        algorithm_func: Callable = self.algorithm_map.get(self.algorithm)
-
-        s_node_iter = looping_range(len(self.start_nodes))
-        s_node_paths = {}
-        paths: list[tuple[list[CircuitNode], int]] = []
-
-        for i in range(self.cars):
-            s_node = self.start_nodes[next(s_node_iter)]
-            if s_node in s_node_paths:
-                path = s_node_paths[s_node]
-            else:
-                path = algorithm_func(s_node, self.finish_nodes)
-                s_node_paths[s_node] = path
-            paths.append(path)
-
-        paths = resolve_collisions(paths, self.graph, self.finish_nodes, self.algorithm)
+        paths = find_paths(self.graph, self.start_nodes, self.finish_nodes, self.algorithm, self.cars,
+                           self.cooperative, self.instruments, self.search_options, self.time_budget)
 
         tuple_paths: list[tuple[list[tuple[int, int]], int]] = []
 
@@ -103,12 +90,3 @@ class Simulator:
         # Running the simulation.
         # Simulation(self.tile_map, tuple_path).simulate()
         return tuple_paths, self.tile_map
-
-
-def looping_range(max_i: int = 0):
-    it = 0
-    while True:
-        if it == max_i:
-            it = 0
-        yield it
-        it += 1
@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import time
+from operator import attrgetter
+from typing import Optional
+
+from src.graph.compact_graph import CompactGraph
+from src.graph.graph import Graph
+from src.graph.instrumentation import Instruments
+from src.graph.lazy_graph import LazyGraph
+from src.mapper.graph_cache import GraphCache, default_cache, graph_key
+from src.mapper.path_gen import generate_paths_graph, lazy_paths_graph, nodes_at, CircuitNode, resolve_collisions, \
+    ALGORITHMS, ANYTIME_ALGORITHMS, BACKENDS, BIDIRECTIONAL_ALGORITHMS
+from src.mapper.planner import cooperative_paths
+from src.models.physics import PhysicsProfile
+from src.parser.parser import parse_map
+
+
+class SolveOptions:
+    """
+    Everything solve takes besides the map, the algorithm and the amount of cars.
+    """
+
+    __slots__ = ('compact', 'lazy', 'cache', 'workers', 'vectorized', 'physics', 'cooperative', 'stats',
+                 'time_budget', 'max_expansions')
+
+    def __init__(self, compact: bool = False, lazy: bool = False, cache: Optional[GraphCache] = default_cache,
+                 workers: int = 1, vectorized: bool = False, physics: Optional[PhysicsProfile] = None,
+                 cooperative: bool = False, stats: bool = False, time_budget: Optional[float] = None,
+                 max_expansions: Optional[int] = None) -> None:
+        """
+        :param compact: Whether to store the graph in the compact (CSR) backend.
+        :param lazy: Whether to only generate the moves the search actually explores.
+        :param cache: Where to look for a previously generated graph of the same map.
+        :param workers: Worker processes generating the graph, 1 to generate it in this process.
+        :param vectorized: Whether to expand the moves in NumPy batches.
+        :param physics: Speed limits of the cars, none by default.
+        :param cooperative: Whether collisions between cars are solved by the cooperative planner,
+                            instead of resolve_collisions. The cars it searches again always get
+                            an optimal path, whatever the algorithm.
+        :param stats: Whether to measure what generating the graph and the searches do, see Instruments.
+        :param time_budget: Seconds the searches of an anytime algorithm may take between them, unbounded if None.
+                            Other algorithms can't stop early, solve rejects any budget for them.
+        :param max_expansions: Nodes every search of an anytime algorithm may expand, unbounded if None.
+        """
+
+        self.compact = compact
+        self.lazy = lazy
+        self.cache = cache
+        self.workers = workers
+        self.vectorized = vectorized
+        self.physics = physics if physics is not None else PhysicsProfile()
+        self.cooperative = cooperative
+        self.stats = stats
+        self.time_budget = time_budget
+        self.max_expansions = max_expansions
+
+
+def build_graph(map_path: str, compact: bool = False, lazy: bool = False, cache: Optional[GraphCache] = None,
+                workers: int = 1, vectorized: bool = False, physics: Optional[PhysicsProfile] = None,
+                instruments: Optional[Instruments] = None) \
+        -> tuple[Graph | CompactGraph | LazyGraph, list[CircuitNode], list[CircuitNode]]:
+    """
+    Given the path to a map, this method generates the corresponding graph.
+    This graph contains every possible play in the game, for every position.
+
+    :param map_path: Map path.
+    :param compact: Whether to store the graph in the compact (CSR) backend.
+    :param lazy: Whether to only generate the moves the search actually explores.
+    :param cache: Where to look for a previously generated graph of the same map.
+    :param workers: Worker processes generating the graph, 1 to generate it in this process.
+    :param vectorized: Whether to expand the moves in NumPy batches.
+    :param physics: Speed limits of the cars, none by default.
+    :param instruments: Where generating the graph reports to, nothing is reported if it comes from the cache.
+    :return: The graph, the start nodes and the finish nodes.
+    """
+
+    if compact and lazy:
+        raise ValueError("the compact backend can't be built lazily")
+
+    if physics is None:
+        physics = PhysicsProfile()
+
+    circuit, start_pos_list, finish_pos_list = parse_map(map_path)
+
+    if lazy:
+        graph = lazy_paths_graph(circuit, start_pos_list, finish_pos_list, physics=physics)
+    else:
+        # The speed limits change the graph generated, so they're part of the key.
+        key = graph_key(map_path, physics) if cache is not None else None
+        graph = cache.get(key, compact) if cache is not None else None
+
+        if graph is None:
+            graph = CompactGraph(True, attrgetter('state'), CircuitNode.from_state) if compact else None
+            graph, closed_set = generate_paths_graph(circuit, start_pos_list, finish_pos_list, graph,
+                                                     workers=workers, vectorized=vectorized, physics=physics,
+                                                     instruments=instruments)
+
+            if cache is not None:
+                cache.put(key, graph)
+
+    start_nodes: list[CircuitNode] = nodes_at(circuit, start_pos_list)
+    finish_nodes: list[CircuitNode] = nodes_at(circuit, finish_pos_list)
+
+    return graph, start_nodes, finish_nodes
+
+
+def find_paths(graph: Graph | CompactGraph | LazyGraph, start_nodes: list[CircuitNode], finish_nodes: list[CircuitNode],
+               algorithm: str, cars: int, cooperative: bool = False,
+               instruments: Optional[Instruments] = None, search_options: Optional[dict] = None,
+               time_budget: Optional[float] = None) -> list[tuple[list[CircuitNode], int]]:
+    """
+    Finds the path of every car, cars take the start nodes in turns, and then solves the
+    collisions between them.
+
+    :param algorithm: Name of the search algorithm, a key of ALGORITHMS.
+    :param cars: Amount of cars.
+    :param cooperative: Whether collisions are solved by the cooperative planner, instead of resolve_collisions.
+                        Only the paths kept come from the algorithm, the cars searched again always get
+                        an optimal path, see cooperative_paths.
+    :param instruments: Where every search reports to.
+    :param search_options: Extra options of every search, like the budget of an anytime algorithm.
+    :param time_budget: Seconds an anytime algorithm may take, shared by the searches of every car and
+                        every replan, unbounded if None. Searches started past it still run greedy
+                        to their first path.
+    :return: Path and cost of every car.
+    """
+
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"unknown algorithm: {algorithm}")
+
+    if algorithm in BIDIRECTIONAL_ALGORITHMS and not graph.supports_predecessors:
+        raise ValueError(f"{algorithm} needs the predecessors of the nodes, which the lazy backend can't list")
+
+    if search_options is None:
+        search_options = {}
+
+    if time_budget is not None:
+        if algorithm not in ANYTIME_ALGORITHMS:
+            raise ValueError(f"{algorithm} can't stop early, it takes no time budget")
+
+        # One deadline for every search, so the budget holds whatever the amount of cars.
+        search_options = dict(search_options, deadline=time.perf_counter() + time_budget)
+
+    search = getattr(graph, ALGORITHMS[algorithm])
+
+    s_node_iter = looping_range(len(start_nodes))
+    s_node_paths = {}
+    paths: list[tuple[list[CircuitNode], int]] = []
+
+    for i in range(cars):
+        s_node = start_nodes[next(s_node_iter)]
+        if s_node in s_node_paths:
+            path = s_node_paths[s_node]
+        else:
+            path = search(s_node, finish_nodes, instruments=instruments, **search_options)
+            if not path or len(path[0]) == 0:
+                raise ValueError(f"{algorithm} found no path from ({s_node.car.pos.x}, {s_node.car.pos.y})")
+
+            s_node_paths[s_node] = path
+        paths.append(path)
+
+    if cooperative:
+        return cooperative_paths(paths, graph, finish_nodes, instruments)
+
+    return resolve_collisions(paths, graph, finish_nodes, algorithm, instruments, search_options)
+
+
+def solve(map_path: str, algorithm: str, cars: int, options: Optional[SolveOptions] = None) -> dict:
+    """
+    Solves a map without any display, pygame isn't even imported.
+
+    :param map_path: Path to the map.
+    :param algorithm: Name of the search algorithm, a key of ALGORITHMS.
+    :param cars: Amount of cars.
+    :param options: How to build the graph and solve collisions, the defaults if None.
+    :return: The solution, ready to be dumped as JSON, with the cost and the cells of the path of every car,
+             and what the Instruments measured in "stats" if asked to. Anytime algorithms also report
+             in "bound" how many times the optimal cost the worst of their searches may be at most.
+    """
+
+    if options is None:
+        options = SolveOptions()
+
+    anytime = algorithm in ANYTIME_ALGORITHMS
+
+    # Same rule as find_paths, a budget that can't hold is an error instead of silently ignored.
+    if not anytime and (options.time_budget is not None or options.max_expansions is not None):
+        raise ValueError(f"{algorithm} can't stop early, it takes no time budget nor max expansions")
+
+    graph_stats = Instruments() if options.stats else None
+    paths_stats = Instruments() if options.stats or anytime else None
+
+    start = time.perf_counter()
+    graph, start_nodes, finish_nodes = build_graph(map_path, options.compact, options.lazy, options.cache,
+                                                   options.workers, options.vectorized, options.physics, graph_stats)
+    graph_time = time.perf_counter() - start
+
+    # Only anytime algorithms can stop early, the others always search to the end.
+    search_options = {"max_expansions": options.max_expansions} if anytime else {}
+
+    start = time.perf_counter()
+    paths = find_paths(graph, start_nodes, finish_nodes, algorithm, cars, options.cooperative, paths_stats,
+                       search_options, options.time_budget)
+    paths_time = time.perf_counter() - start
+
+    solution = {
+        "map": os.path.basename(map_path),
+        "algorithm": algorithm,
+        "cars": cars,
+        "physics": str(options.physics),
+        "cooperative": options.cooperative,
+        "time": {
+            "build_graph": graph_time,
+            "find_paths": paths_time
+        },
+        "paths": [
+            {
+                "cost": cost,
+                "cells": [[node.car.pos.x, node.car.pos.y] for node in path]
+            } for (path, cost) in paths
+        ]
+    }
+
+    if anytime:
+        solution["bound"] = paths_stats.peaks.get('bound', 1.0)
+
+    if options.stats:
+        solution["stats"] = {
+            "build_graph": graph_stats.report(),
+            "find_paths": paths_stats.report()
+        }
+
+    return solution
+
+
+def looping_range(max_i: int = 0):
+    it = 0
+    while True:
+        if it == max_i:
+            it = 0
+        yield it
+        it += 1
+
+
+def add_solve_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the flags of every SolveOptions to a command line parser, see solve_options.
+    """
+
+    parser.add_argument("--backend", choices=BACKENDS, default="dict", help="graph backend")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes generating the graph")
+    parser.add_argument("--vectorized", action="store_true", help="expand the moves in NumPy batches")
+    parser.add_argument("--max-axis-speed", type=int, help="largest speed allowed on each axis")
+    parser.add_argument("--max-speed", type=float, help="largest length allowed of the velocity vector")
+    parser.add_argument("--cooperative", action="store_true", help="solve collisions with the cooperative planner")
+    parser.add_argument("--cache-dir", help="folder where generated graphs are kept between runs")
+    parser.add_argument("--time-budget", type=float, help="seconds ARA* may take to find the paths of every car")
+    parser.add_argument("--max-expansions", type=int, help="nodes every search of ARA* may expand")
+    parser.add_argument("--stats", action="store_true", help="also report the nodes expanded and time per phase")
+
+
+def solve_options(args: argparse.Namespace) -> SolveOptions:
+    """
+    The SolveOptions of the flags added by add_solve_arguments.
+    """
+
+    return SolveOptions(compact=args.backend == "compact", lazy=args.backend == "lazy",
+                        cache=GraphCache(cache_dir=args.cache_dir) if args.cache_dir else None,
+                        workers=args.workers, vectorized=args.vectorized,
+                        physics=PhysicsProfile(args.max_axis_speed, args.max_speed), cooperative=args.cooperative,
+                        stats=args.stats, time_budget=args.time_budget, max_expansions=args.max_expansions)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Solves a map without any display and prints the paths as JSON.")
+    parser.add_argument("map", help="path to the map")
+    parser.add_argument("--algorithm", choices=list(ALGORITHMS), default="A*", help="search algorithm")
+    parser.add_argument("--cars", type=int, default=1, help="amount of cars")
+    add_solve_arguments(parser)
+    parser.add_argument("--output", help="file to write the JSON solution to, stdout by default")
+    args = parser.parse_args()
+
+    options = solve_options(args)
+
+    try:
+        solution = solve(args.map, args.algorithm, args.cars, options)
+    except (OSError, ValueError) as error:
+        parser.exit(1, f"error: {error}\n")
+
+    output = json.dumps(solution, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    SystemExit(main())
@@ -1,46 +1,142 @@
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
 import pygame
-import os
 
+TILE_SIZE = 64
+
+# Texture of every map piece, pieces missing here are left transparent.
+TILE_IMAGES = {
+    'X': '../docs/assets/grass-ico.jpg',
+    '-': '../docs/assets/cobblestone-ico.png',
+    'P': '../docs/assets/redstone-block-ico.png',
+    'F': '../docs/assets/gold-block-ico.png'
+}
+
+
+class TileAtlas:
+    """
+    Every tile texture, decoded once and laid side by side on a single surface, so a whole map
+    is drawn with one batched blit out of it.
+    """
+
+    def __init__(self, images: dict[str, str], tile_size: int = TILE_SIZE) -> None:
+        """
+        :param images: Image file of every map piece.
+        :param tile_size: Side of the tiles, in pixels.
+        """
+
+        self.tile_size = tile_size
+        self.areas: dict[str, pygame.Rect] = {}
+
+        self.surface = pygame.Surface((tile_size * len(images), tile_size))
+        for (i, (piece, image)) in enumerate(images.items()):
+            area = pygame.Rect(i * tile_size, 0, tile_size, tile_size)
+            self.surface.blit(pygame.image.load(image), area)
+            self.areas[piece] = area
+
+        self.converted = False
+        self.convert()
+
+    def convert(self) -> None:
+        """
+        Turns the atlas into the pixel format of the display, which blits much faster. It can only
+        be done once a display mode is set, until then the atlas is kept as loaded.
+        """
 
-class Tile(pygame.sprite.Sprite):
+        if not self.converted and pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert()
+            self.converted = True
 
-    def __init__(self, image, x, y):
+    def render(self, surface: pygame.Surface, layout: list[tuple[str, int, int]]) -> None:
+        """
+        Draws the tiles of a layout.
 
-        pygame.sprite.Sprite.__init__(self)
+        :param layout: Piece and (x, y) pixel position of every tile.
+        """
+
+        self.convert()
+
+        atlas, areas = self.surface, self.areas
+        surface.blits([(atlas, (x, y), areas[piece]) for (piece, x, y) in layout if piece in areas], doreturn=False)
+
+
+class MapSurfaceCache:
+    """
+    Rendered map surfaces, by map file contents, with LRU eviction.
+
+    Surfaces handed out by the cache are shared, callers must not draw on them.
+    """
+
+    def __init__(self, max_entries: int = 8) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, tuple[pygame.Surface, int, int, int, int]] = OrderedDict()
+        self.atlas: Optional[TileAtlas] = None
+
+    @staticmethod
+    def map_key(filename: str, tile_size: int) -> str:
+        digest = hashlib.sha256()
 
-        self.image = pygame.image.load(image)
+        with open(filename, "rb") as map_file:
+            digest.update(map_file.read())
 
-        self.rect = self.image.get_rect()
-        self.rect.x, self.rect.y = x, y
+        digest.update(f";tile:{tile_size}".encode())
+        return digest.hexdigest()
 
-    def draw(self, surface):
-        surface.blit(self.image, (self.rect.x, self.rect.y))
+    def get_atlas(self) -> TileAtlas:
+        # Loaded on first use, pygame must be initialized by then.
+        if self.atlas is None:
+            self.atlas = TileAtlas(TILE_IMAGES)
+        return self.atlas
+
+    def get(self, tile_map: 'TileMap', filename: str) -> tuple[pygame.Surface, int, int, int, int]:
+        """
+        Looks the surface of a map up, rendering it if it isn't cached.
+
+        :return: The surface, its width and height, and the start position, in pixels.
+        """
+
+        key = self.map_key(filename, tile_map.tile_size)
+
+        entry = self.entries.get(key)
+        if entry is None:
+            layout = tile_map.load_tiles(filename)
+
+            surface = pygame.Surface((tile_map.map_w, tile_map.map_h))
+            surface.set_colorkey((0, 0, 0))
+            self.get_atlas().render(surface, layout)
+
+            entry = (surface, tile_map.map_w, tile_map.map_h, tile_map.start_x, tile_map.start_y)
+
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+        return entry
+
+
+# Cache shared by every TileMap unless told otherwise.
+default_surfaces = MapSurfaceCache()
 
 
 class TileMap:
 
-    def __init__(self, filename):
+    def __init__(self, filename, surfaces: MapSurfaceCache = default_surfaces):
 
         self.map_h = None
         self.map_w = None
 
-        self.tile_size = 64
+        self.tile_size = TILE_SIZE
         self.start_x, self.start_y = 0, 0
 
-        self.tiles = self.load_tiles(filename)
-
-        self.map_surface = pygame.Surface((self.map_w, self.map_h))
-        self.map_surface.set_colorkey((0, 0, 0))
-
-        self.load_map()
+        self.map_surface, self.map_w, self.map_h, self.start_x, self.start_y = surfaces.get(self, filename)
 
     def draw_map(self, surface):
         surface.blit(self.map_surface, (0, 0))
 
-    def load_map(self):
-        for tile in self.tiles:
-            tile.draw(self.map_surface)
-
     @staticmethod
     def read_map(filename):
 
@@ -54,7 +150,12 @@ class TileMap:
 
         return gen_map
 
-    def load_tiles(self, filename):
+    def load_tiles(self, filename) -> list[tuple[str, int, int]]:
+        """
+        Reads the layout of a map, also setting its size and start position.
+
+        :return: Piece and (x, y) pixel position of every tile.
+        """
 
         tiles = []
         our_map = self.read_map(filename)
@@ -65,34 +166,8 @@ class TileMap:
             for tile in row:
                 if tile == ' ':
                     self.start_x, self.start_y = x * self.tile_size, y * self.tile_size
-
-                elif tile == 'X':
-                    tiles.append(Tile(
-                        '../docs/assets/grass-ico.jpg',
-                        x * self.tile_size,
-                        y * self.tile_size
-                    ))
-
-                elif tile == '-':
-                    tiles.append(Tile(
-                        '../docs/assets/cobblestone-ico.png',
-                        x * self.tile_size,
-                        y * self.tile_size
-                    ))
-
-                elif tile == 'P':
-                    tiles.append(Tile(
-                        '../docs/assets/redstone-block-ico.png',
-                        x * self.tile_size,
-                        y * self.tile_size
-                    ))
-
-                elif tile == 'F':
-                    tiles.append(Tile(
-                        '../docs/assets/gold-block-ico.png',
-                        x * self.tile_size,
-                        y * self.tile_size
-                    ))
+                else:
+                    tiles.append((tile, x * self.tile_size, y * self.tile_size))
 
                 x += 1
             y += 1
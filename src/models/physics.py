@@ -0,0 +1,51 @@
+from typing import Optional
+
+
+class PhysicsProfile:
+    """
+    Rules on how fast a car may go. A move whose velocity breaks any of them can't be played,
+    which bounds the amount of states a circuit has. The default profile sets no limit.
+    """
+
+    __slots__ = ('max_axis_speed', 'max_speed')
+
+    def __init__(self, max_axis_speed: Optional[int] = None, max_speed: Optional[float] = None) -> None:
+        """
+        :param max_axis_speed: Largest absolute velocity allowed on each axis.
+        :param max_speed: Largest length allowed of the velocity vector.
+        """
+
+        if (max_axis_speed is not None and max_axis_speed < 0) or (max_speed is not None and max_speed < 0):
+            raise ValueError("speed limits can't be negative")
+
+        self.max_axis_speed: Optional[int] = max_axis_speed
+        self.max_speed: Optional[float] = max_speed
+
+    @property
+    def bounded(self) -> bool:
+        return self.max_axis_speed is not None or self.max_speed is not None
+
+    def allows(self, vx, vy):
+        """
+        Whether a car may move at a velocity. Works both on plain ints and element wise on NumPy arrays.
+        """
+
+        allowed = True
+
+        if self.max_axis_speed is not None:
+            allowed = (abs(vx) <= self.max_axis_speed) & (abs(vy) <= self.max_axis_speed) & allowed
+
+        if self.max_speed is not None:
+            allowed = (vx * vx + vy * vy <= self.max_speed * self.max_speed) & allowed
+
+        return allowed
+
+    def __eq__(self, other: 'PhysicsProfile') -> bool:
+        return self.max_axis_speed == other.max_axis_speed and self.max_speed == other.max_speed
+
+    def __hash__(self):
+        return hash((self.max_axis_speed, self.max_speed))
+
+    def __str__(self) -> str:
+        # Part of the graph cache keys, so it must be stable.
+        return f"physics(axis={self.max_axis_speed},norm={self.max_speed})"
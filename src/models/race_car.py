@@ -1,9 +1,16 @@
-from pydantic import BaseModel
+from typing import Optional
 
 
-class Coordinates(BaseModel):
-    x: int
-    y: int
+class Coordinates:
+    """
+    Mutable pair of integer coordinates. Slotted, since every car state holds three of them.
+    """
+
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x: int = 0, y: int = 0) -> None:
+        self.x: int = x
+        self.y: int = y
 
     @classmethod
     def empty(cls) -> 'Coordinates':
@@ -15,9 +22,18 @@ class Coordinates(BaseModel):
     def __eq__(self, other: 'Coordinates') -> bool:
         return self.x == other.x and self.y == other.y
 
+    def __repr__(self) -> str:
+        return f"Coordinates(x={self.x}, y={self.y})"
+
     def __hash__(self):
         return hash((self.x * 0x1f1f1f1f) ^ self.y)
 
+    def __copy__(self) -> 'Coordinates':
+        return Coordinates(self.x, self.y)
+
+    def __deepcopy__(self, memo: dict) -> 'Coordinates':
+        return Coordinates(self.x, self.y)
+
 
 class RaceCar:
     """
@@ -25,11 +41,15 @@ class RaceCar:
     A car has its position, velocity and acceleration.
     """
 
-    def __init__(self, pos=Coordinates.empty(), vel=Coordinates.empty(), acc=Coordinates.empty()):
+    __slots__ = ('pos', 'vel', 'acc')
 
-        self.pos: Coordinates = pos
-        self.vel: Coordinates = vel
-        self.acc: Coordinates = acc
+    def __init__(self, pos: Optional[Coordinates] = None, vel: Optional[Coordinates] = None,
+                 acc: Optional[Coordinates] = None):
+
+        # Every car gets its own coordinates, since moves update them in place.
+        self.pos: Coordinates = pos if pos is not None else Coordinates.empty()
+        self.vel: Coordinates = vel if vel is not None else Coordinates.empty()
+        self.acc: Coordinates = acc if acc is not None else Coordinates.empty()
 
     def __eq__(self, other: 'RaceCar'):
         return (self.pos == other.pos) and (self.vel == other.vel)
@@ -102,5 +122,9 @@ class RaceCar:
         self.vel.x = 0
         self.vel.y = 0
 
+    def hash_key(self) -> tuple[int, int, int, int]:
+        # Velocities are made positive first, since hash(-1) == hash(-2).
+        return self.pos.x, self.pos.y, self.vel.x + 0x10000, self.vel.y + 0x10000
+
     def __hash__(self):
-        return hash(self.pos.x + self.pos.y + self.vel.x + self.vel.y)
+        return hash(self.hash_key())
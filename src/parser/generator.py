@@ -0,0 +1,146 @@
+import argparse
+import random
+from typing import Iterator, Optional
+
+
+def track_intervals(length: int, breadth: int, track_width: int, curvature: float,
+                    rng: random.Random) -> list[tuple[int, int]]:
+    """
+    Lays a winding track along the major axis of the circuit. The track center follows a
+    random walk whose slope drifts by up to `curvature` per step, bouncing off the borders.
+
+    :param length: Size of the circuit along the track.
+    :param breadth: Size of the circuit across the track.
+    :param track_width: Width of the track, in cells.
+    :param curvature: How twisty the track is, from 0 (straight) to 1.
+    :param rng: Random source.
+    :return: For each position along the major axis, the first and last track cell across it,
+             or (1, 0) where there's no track (the borders).
+    """
+
+    half = track_width // 2
+    low = 1 + half
+    high = breadth - 2 - (track_width - 1 - half)
+
+    # Consecutive slices must overlap (or touch diagonally), so cars can go from one to the next.
+    max_slope = max(1, track_width - 1) * curvature
+
+    center = (low + high) / 2
+    slope = 0.0
+
+    intervals = [(1, 0)]
+    for _ in range(1, length - 1):
+        first = round(center) - half
+        intervals.append((first, first + track_width - 1))
+
+        slope = max(-max_slope, min(slope + rng.uniform(-curvature, curvature), max_slope))
+        center += slope
+
+        if center < low or center > high:
+            center = max(low, min(center, high))
+            slope = -slope
+
+    intervals.append((1, 0))
+    return intervals
+
+
+def spread_cells(intervals: list[tuple[int, int]], count: int, from_start: bool) -> list[tuple[int, int]]:
+    """
+    Picks `count` track cells at one end of the track, filling whole slices one after the other.
+
+    :return: List of (major, minor) positions.
+    """
+
+    cells = []
+    order = range(1, len(intervals) - 1) if from_start else range(len(intervals) - 2, 0, -1)
+
+    for major in order:
+        first, last = intervals[major]
+        for minor in range(first, last + 1):
+            if len(cells) == count:
+                return cells
+            cells.append((major, minor))
+
+    return cells
+
+
+def circuit_rows(width: int, height: int, track_width: int = 5, curvature: float = 0.3, starts: int = 1,
+                 finishes: int = 0, seed: Optional[int] = None) -> Iterator[str]:
+    """
+    Generates a random circuit, one row at a time, in the format read by parse_map. The track
+    runs along the longest side of the circuit, starting at one end and finishing at the other.
+    Only O(width + height) memory is used, whatever the size of the circuit.
+
+    :param width: Circuit width, in cells.
+    :param height: Circuit height, in cells.
+    :param track_width: Width of the track, in cells.
+    :param curvature: How twisty the track is, from 0 (straight) to 1.
+    :param starts: Amount of start ('P') cells.
+    :param finishes: Amount of finish ('F') cells, 0 for the whole width of the track.
+    :param seed: Seed of the random generator, so circuits can be reproduced.
+    """
+
+    horizontal = width >= height
+    length, breadth = (width, height) if horizontal else (height, width)
+
+    if track_width < 1 or breadth < track_width + 2 or length < 4:
+        raise ValueError(f"a {width}x{height} circuit can't hold a track {track_width} cells wide")
+
+    if not 0 <= curvature <= 1:
+        raise ValueError("curvature must be between 0 and 1")
+
+    if starts < 1 or finishes < 0 or starts + (finishes or track_width) > (length - 2) * track_width:
+        raise ValueError("invalid amount of start or finish cells")
+
+    rng = random.Random(seed)
+    intervals = track_intervals(length, breadth, track_width, curvature, rng)
+
+    special = {cell: 'P' for cell in spread_cells(intervals, starts, True)}
+    special.update({cell: 'F' for cell in spread_cells(intervals, finishes or track_width, False)})
+
+    def piece(major: int, minor: int) -> str:
+        first, last = intervals[major]
+        if not first <= minor <= last:
+            return 'X'
+        return special.get((major, minor), '-')
+
+    for y in range(height):
+        if horizontal:
+            yield ' '.join(piece(x, y) for x in range(width))
+        else:
+            yield ' '.join(piece(y, x) for x in range(width))
+
+
+def generate_circuit(path: str, width: int, height: int, track_width: int = 5, curvature: float = 0.3,
+                     starts: int = 1, finishes: int = 0, seed: Optional[int] = None) -> None:
+    """
+    Writes a random circuit to a map file, streaming its rows so big circuits never sit in memory.
+    Takes the same parameters as circuit_rows.
+
+    :param path: Where to write the map.
+    """
+
+    with open(path, "w") as map_file:
+        for row in circuit_rows(width, height, track_width, curvature, starts, finishes, seed):
+            map_file.write(row + '\n')
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Generates random circuits for scale testing.")
+    parser.add_argument("path", help="where to write the map")
+    parser.add_argument("--width", type=int, default=100)
+    parser.add_argument("--height", type=int, default=100)
+    parser.add_argument("--track-width", type=int, default=5)
+    parser.add_argument("--curvature", type=float, default=0.3)
+    parser.add_argument("--starts", type=int, default=1)
+    parser.add_argument("--finishes", type=int, default=0, help="0 for the whole width of the track")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    generate_circuit(args.path, args.width, args.height, args.track_width, args.curvature, args.starts,
+                     args.finishes, args.seed)
+
+
+if __name__ == '__main__':
+    SystemExit(main())
@@ -0,0 +1,77 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from src.graph.graph import Graph
+from src.graph.instrumentation import Instruments
+from src.mapper.path_gen import generate_paths_graph, nodes_at
+from src.parser.parser import parse_map
+
+MAPS = Path(__file__).parent.parent / "docs" / "maps"
+
+BUDGETS = [None, 1, 3, 10, 50]
+
+
+def random_graph(seed: int, size: int = 60) -> tuple[Graph, int, list[int]]:
+    """
+    Seeded random graph with an admissible heuristic, a random fraction of the actual cost
+    to the goals, plus its start and goals.
+    """
+
+    rng = random.Random(seed)
+    graph = Graph(True)
+
+    for node in range(size):
+        graph.add_edge(node, (node + 1) % size, rng.randint(1, 25))
+    for _ in range(size * 3):
+        graph.add_edge(rng.randrange(size), rng.randrange(size), rng.randint(0, 25))
+
+    goals = rng.sample(range(1, size), 2)
+    for node in range(size):
+        result = graph.uniform_cost_search(node, goals) if node not in goals else None
+        graph.add_heuristic(node, int(rng.random() * result[1]) if result is not None else 0)
+
+    return graph, 0, goals
+
+
+def assert_bounded(graph, start, end_list, optimal: int, max_expansions) -> None:
+    solutions = []
+    instruments = Instruments()
+
+    path, cost = graph.anytime_a_star_search(start, end_list, max_expansions=max_expansions,
+                                             on_solution=lambda *solution: solutions.append(solution),
+                                             instruments=instruments)
+
+    assert path[0] == start and path[-1] in end_list
+    assert graph.path_cost(path) == cost >= optimal
+    assert cost <= instruments.peaks['bound'] * optimal
+
+    for (found_path, found_cost, bound) in solutions:
+        assert graph.path_cost(found_path) == found_cost
+        assert bound >= 1 and found_cost <= bound * optimal
+
+    assert [cost for (_, cost, _) in solutions] == sorted({cost for (_, cost, _) in solutions}, reverse=True)
+    assert solutions[-1][1] == cost
+
+    if max_expansions is None:
+        assert cost == optimal
+
+
+@pytest.mark.parametrize("seed", range(25))
+@pytest.mark.parametrize("max_expansions", BUDGETS)
+def test_random_graphs(seed, max_expansions):
+    graph, start, goals = random_graph(seed)
+
+    assert_bounded(graph, start, goals, graph.uniform_cost_search(start, goals)[1], max_expansions)
+
+
+@pytest.mark.parametrize("map_name", ["map_a.txt", "map_d.txt", "map_e.txt"])
+@pytest.mark.parametrize("max_expansions", BUDGETS)
+def test_maps(map_name, max_expansions):
+    circuit, start_pos_list, finish_pos_list = parse_map(str(MAPS / map_name))
+    graph, _ = generate_paths_graph(circuit, start_pos_list, finish_pos_list)
+    finishes = nodes_at(circuit, finish_pos_list)
+
+    for start in nodes_at(circuit, start_pos_list):
+        assert_bounded(graph, start, finishes, graph.uniform_cost_search(start, finishes)[1], max_expansions)
@@ -0,0 +1,70 @@
+import random
+from operator import attrgetter
+from pathlib import Path
+
+import pytest
+
+from src.graph.compact_graph import CompactGraph
+from src.graph.graph import Graph
+from src.mapper.path_gen import CircuitNode, generate_paths_graph, nodes_at
+from src.parser.parser import parse_map
+
+MAPS = Path(__file__).parent.parent / "docs" / "maps"
+
+
+def random_graph(seed: int, size: int = 40, edges: int = 120) -> Graph:
+    rng = random.Random(seed)
+    graph = Graph(True)
+
+    for node in range(size):
+        graph.add_edge(node, rng.randrange(size), rng.randint(0, 25))
+
+    for _ in range(edges):
+        graph.add_edge(rng.randrange(size), rng.randrange(size), rng.randint(0, 25))
+
+    return graph
+
+
+def assert_valid_path(graph, path: list, cost: int, start, end_list) -> None:
+    assert path[0] == start and path[-1] in end_list
+    assert all(graph.get_weight(path[i], path[i + 1]) is not None for i in range(len(path) - 1))
+    assert graph.path_cost(path) == cost
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_random_graphs(seed):
+    graph = random_graph(seed)
+    rng = random.Random(-seed)
+    start = rng.randrange(40)
+    end_list = rng.sample([node for node in range(40) if node != start], 3)
+
+    path, cost = graph.bidirectional_bfs_search(start, end_list)
+    bfs_path, _ = graph.bfs_search(start, end_list)
+    assert len(path) == len(bfs_path)
+    if path:
+        assert_valid_path(graph, path, cost, start, end_list)
+
+    ucs = graph.uniform_cost_search(start, end_list)
+    result = graph.bidirectional_dijkstra_search(start, end_list)
+    assert (result is None) == (ucs is None)
+    if result is not None:
+        assert result[1] == ucs[1]
+        assert_valid_path(graph, *result, start, end_list)
+
+
+@pytest.mark.parametrize("map_name", sorted(path.name for path in MAPS.glob("*.txt")))
+@pytest.mark.parametrize("backend", ["dict", "compact"])
+def test_maps(map_name, backend):
+    circuit, start_pos_list, finish_pos_list = parse_map(str(MAPS / map_name))
+    graph = CompactGraph(True, attrgetter('state'), CircuitNode.from_state) if backend == "compact" else None
+    graph, _ = generate_paths_graph(circuit, start_pos_list, finish_pos_list, graph)
+    finishes = nodes_at(circuit, finish_pos_list)
+
+    for start in nodes_at(circuit, start_pos_list):
+        path, cost = graph.bidirectional_bfs_search(start, finishes)
+        assert len(path) == len(graph.bfs_search(start, finishes)[0])
+        assert_valid_path(graph, path, cost, start, finishes)
+
+        path, cost = graph.bidirectional_dijkstra_search(start, finishes)
+        assert cost == graph.uniform_cost_search(start, finishes)[1]
+        assert_valid_path(graph, path, cost, start, finishes)
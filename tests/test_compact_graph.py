@@ -0,0 +1,45 @@
+import io
+from operator import attrgetter
+from pathlib import Path
+
+import pytest
+
+from src.graph.compact_graph import CompactGraph
+from src.mapper.path_gen import CircuitNode, generate_paths_graph, nodes_at
+from src.parser.parser import parse_map
+
+MAPS = Path(__file__).parent.parent / "docs" / "maps"
+
+
+def compact_paths_graph(map_name: str) -> tuple[CompactGraph, list, list]:
+    circuit, start_pos_list, finish_pos_list = parse_map(str(MAPS / map_name))
+    graph, _ = generate_paths_graph(circuit, start_pos_list, finish_pos_list,
+                                    CompactGraph(True, attrgetter('state'), CircuitNode.from_state))
+
+    return graph, nodes_at(circuit, start_pos_list), nodes_at(circuit, finish_pos_list)
+
+
+@pytest.mark.parametrize("map_name", ["map_a.txt", "map_e.txt"])
+def test_save_load_round_trip(map_name):
+    graph, starts, finishes = compact_paths_graph(map_name)
+
+    file = io.BytesIO()
+    graph.save(file)
+    file.seek(0)
+    loaded = CompactGraph.load(file, attrgetter('state'), CircuitNode.from_state)
+
+    assert loaded.is_directed == graph.is_directed
+    assert list(loaded.keys) == list(graph.keys)
+    assert list(loaded.offsets) == list(graph.offsets)
+    assert list(loaded.targets) == list(graph.targets)
+    assert list(loaded.weights) == list(graph.weights)
+    assert loaded.heur.tobytes() == graph.heur.tobytes()
+    assert loaded.index == graph.index
+
+    for start in starts:
+        assert loaded.a_star_search(start, finishes) == graph.a_star_search(start, finishes)
+
+
+def test_load_rejects_other_files():
+    with pytest.raises(ValueError):
+        CompactGraph.load(io.BytesIO(bytes(64)))
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from src.graph.graph import Graph
+
+
+def chain(length: int) -> Graph:
+    graph = Graph(True)
+
+    for node in range(length):
+        graph.add_edge(node, node + 1, 1)
+
+    return graph
+
+
+def test_depth_zero_only_finds_the_start():
+    graph = chain(3)
+
+    assert graph.depth_limited_search(0, [1], 0) == (None, True)
+    assert graph.depth_limited_search(0, [0], 0) == (([0], 0), False)
+    assert graph.dfs_search(0, [1], 0) is None
+    assert graph.iddfs_search(0, [1], 0) is None
+
+
+@pytest.mark.parametrize("max_depth", range(3))
+def test_depth_limit_is_never_exceeded(max_depth):
+    graph = chain(3)
+
+    result, cut_off = graph.depth_limited_search(0, [3], max_depth)
+
+    assert result is None and cut_off
+    assert graph.depth_limited_search(0, [3], 3) == (([0, 1, 2, 3], 3), False)
+
+
+def test_no_cut_off_when_everything_was_reached():
+    assert chain(3).depth_limited_search(0, [7], 5) == (None, False)
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_iddfs_finds_the_fewest_edges(seed):
+    rng = random.Random(seed)
+    graph = Graph(True)
+    for _ in range(60):
+        graph.add_edge(rng.randrange(25), rng.randrange(25), rng.randint(1, 9))
+
+    start = rng.choice(list(graph.nodes()))
+    goals = [node for node in graph.nodes() if node != start][:2]
+
+    bfs_path, _ = graph.bfs_search(start, goals)
+    result = graph.iddfs_search(start, goals)
+
+    if not bfs_path:
+        assert result is None
+    else:
+        path, cost = result
+        assert len(path) == len(bfs_path)
+        assert path[0] == start and path[-1] in goals
+        assert graph.path_cost(path) == cost
+
+        # One edge short of the shortest path, the limited searches must come back empty.
+        assert graph.dfs_search(start, goals, len(path) - 2) is None
@@ -0,0 +1,37 @@
+import pytest
+
+from src.mapper.path_gen import generate_paths_graph, nodes_at
+from src.parser.generator import circuit_rows, generate_circuit
+from src.parser.parser import parse_map
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_seed_reproduces_the_circuit(seed):
+    rows = list(circuit_rows(60, 20, seed=seed))
+
+    assert rows == list(circuit_rows(60, 20, seed=seed))
+    assert rows != list(circuit_rows(60, 20, seed=seed + 100))
+
+
+@pytest.mark.parametrize("size", [(40, 16), (16, 40)])
+@pytest.mark.parametrize("seed", range(5))
+def test_every_start_reaches_the_finish(tmp_path, size, seed):
+    width, height = size
+    map_path = tmp_path / "circuit.txt"
+    generate_circuit(str(map_path), width, height, track_width=4, curvature=0.5, starts=3, finishes=2, seed=seed)
+
+    circuit, start_pos_list, finish_pos_list = parse_map(str(map_path))
+    assert (len(circuit[0]), len(circuit)) == size
+    assert (len(start_pos_list), len(finish_pos_list)) == (3, 2)
+
+    graph, _ = generate_paths_graph(circuit, start_pos_list, finish_pos_list)
+    finishes = nodes_at(circuit, finish_pos_list)
+    for start in nodes_at(circuit, start_pos_list):
+        assert graph.a_star_search(start, finishes) is not None
+
+
+@pytest.mark.parametrize("options", [dict(width=10, height=4), dict(width=40, height=16, curvature=2),
+                                     dict(width=40, height=16, starts=0)])
+def test_invalid_circuits(options):
+    with pytest.raises(ValueError):
+        list(circuit_rows(**options))
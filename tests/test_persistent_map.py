@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from src.graph.persistent_map import PersistentMap
+
+
+class Colliding:
+    """
+    Key whose hash only keeps a few bits of its value, so many keys share a whole hash.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Colliding) and other.value == self.value
+
+    def __hash__(self) -> int:
+        return self.value % 7
+
+    def __repr__(self) -> str:
+        return f"Colliding({self.value})"
+
+
+def random_key(rng: random.Random):
+    match rng.randrange(3):
+        case 0:
+            return rng.randrange(200)
+        case 1:
+            # Same low bits, so they only part ways deep in the trie.
+            return rng.randrange(8) << 45
+        case _:
+            return Colliding(rng.randrange(30))
+
+
+def assert_same(pmap: PersistentMap, expected: dict) -> None:
+    assert len(pmap) == len(expected)
+    assert dict(pmap.items()) == expected
+    assert sorted(map(repr, pmap)) == sorted(map(repr, expected))
+
+    for key, value in expected.items():
+        assert key in pmap and pmap[key] == value and pmap.get(key) == value
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_dict(seed):
+    rng = random.Random(seed)
+    base = {random_key(rng): rng.random() for _ in range(rng.randrange(40))}
+
+    pmap, expected = PersistentMap(dict(base)), dict(base)
+    versions = [(pmap, dict(expected))]
+
+    for _ in range(300):
+        key = random_key(rng)
+
+        match rng.randrange(4):
+            case 0 | 1:
+                value = rng.random()
+                pmap, expected[key] = pmap.set(key, value), value
+            case 2:
+                if key in expected:
+                    pmap = pmap.delete(key)
+                    del expected[key]
+                else:
+                    with pytest.raises(KeyError):
+                        pmap.delete(key)
+            case _:
+                editor = pmap.edit()
+                for _ in range(rng.randrange(1, 20)):
+                    key = random_key(rng)
+                    if rng.random() < 0.3 and key in expected:
+                        del editor[key]
+                        del expected[key]
+                    else:
+                        editor[key] = expected[key] = rng.random()
+                    assert len(editor) == len(expected)
+                pmap = editor.finish()
+
+        assert (key in pmap) == (key in expected)
+        assert pmap.get(key, None) == expected.get(key, None)
+        versions.append((pmap, dict(expected)))
+
+    assert_same(pmap, expected)
+
+    # Every older version must be left as it was.
+    for old, old_expected in versions[::25]:
+        assert_same(old, old_expected)
+
+    # The base mapping is only read, never written.
+    assert pmap.base == base
@@ -0,0 +1,68 @@
+import random
+from operator import attrgetter
+from pathlib import Path
+
+import pytest
+
+from src.graph.compact_graph import CompactGraph
+from src.graph.graph import Graph
+from src.mapper.path_gen import CircuitNode, generate_paths_graph, nodes_at
+from src.parser.parser import parse_map
+
+MAPS = Path(__file__).parent.parent / "docs" / "maps"
+
+
+def cheapest(graph: Graph, start, end_list) -> int | None:
+    """
+    Cost of the cheapest path, by brute force relaxation of every edge (Bellman-Ford).
+    """
+
+    cost = {start: 0}
+    for _ in range(len(graph.graph)):
+        for node in list(cost):
+            for (adjacent_node, weight) in graph.get_neighbours(node):
+                if adjacent_node not in cost or cost[node] + weight < cost[adjacent_node]:
+                    cost[adjacent_node] = cost[node] + weight
+
+    return min((cost[node] for node in end_list if node in cost), default=None)
+
+
+def assert_optimal(graph, result, start, end_list, optimal) -> None:
+    if optimal is None:
+        assert result is None
+        return
+
+    path, cost = result
+    assert path[0] == start and path[-1] in end_list
+    assert graph.path_cost(path) == cost == optimal
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_random_graphs(seed):
+    rng = random.Random(seed)
+    graph = Graph(True)
+    for _ in range(100):
+        graph.add_edge(rng.randrange(30), rng.randrange(30), rng.choice([0, 1, 1, 1, 25]))
+
+    start = rng.choice(list(graph.nodes()))
+    end_list = rng.sample([node for node in graph.nodes() if node != start], 2)
+    optimal = cheapest(graph, start, end_list)
+
+    assert_optimal(graph, graph.uniform_cost_search(start, end_list), start, end_list, optimal)
+    assert_optimal(graph, graph.dial_search(start, end_list), start, end_list, optimal)
+
+
+@pytest.mark.parametrize("map_name", sorted(path.name for path in MAPS.glob("*.txt")))
+@pytest.mark.parametrize("backend", ["dict", "compact"])
+def test_maps(map_name, backend):
+    circuit, start_pos_list, finish_pos_list = parse_map(str(MAPS / map_name))
+    graph = CompactGraph(True, attrgetter('state'), CircuitNode.from_state) if backend == "compact" else None
+    graph, _ = generate_paths_graph(circuit, start_pos_list, finish_pos_list, graph)
+    finishes = nodes_at(circuit, finish_pos_list)
+
+    for start in nodes_at(circuit, start_pos_list):
+        # A* with the admissible finish distance heuristic is the reference here.
+        _, optimal = graph.a_star_search(start, finishes)
+
+        assert_optimal(graph, graph.uniform_cost_search(start, finishes), start, finishes, optimal)
+        assert_optimal(graph, graph.dial_search(start, finishes), start, finishes, optimal)